@@ -21,6 +21,12 @@ $max_lines = 10;
 // Set the log file name and path.
 $log_file = __DIR__ . '/logdir/filename.txt';
 
+// Set the log sequence file path, it numbers the log lines (see read_seq()).
+$seq_file = __DIR__ . '/logdir/filename.seq';
+
+// Set the log lock file path, log and seq file readers/writers are serialized on it.
+$lock_file = __DIR__ . '/logdir/filename.lock';
+
 // Set the log directory index path.
 $log_index_file = __DIR__ . '/logdir/index.php';
 
@@ -32,6 +38,105 @@ if (file_exists($encryption_key_path)) {
     $encryption_key = file_get_contents($encryption_key_path);
 }
 
+// Every logged line has a monotonic sequence number. The log file holds the lines
+// first..last, the seq file stores the epoch of the log (a new one whenever the
+// numbering starts over) and the number of its first line.
+function read_seq($seq_file) {
+    $seq = file_exists($seq_file) ? json_decode(file_get_contents($seq_file), true) : null;
+    if (!is_array($seq) || !isset($seq['epoch'], $seq['first'])) {
+        $seq = array('epoch' => bin2hex(openssl_random_pseudo_bytes(16)), 'first' => 1);
+        file_put_contents($seq_file, json_encode($seq));
+    }
+    return $seq;
+}
+
+// Take a shared (LOCK_SH) or exclusive (LOCK_EX) lock on the log and seq files.
+function lock_log($lock_file, $mode) {
+    $lock = fopen($lock_file, 'c');
+    flock($lock, $mode);
+    return $lock;
+}
+
+function unlock_log($lock) {
+    flock($lock, LOCK_UN);
+    fclose($lock);
+}
+
+// Serve the log file to rmSMS clients (GET ?read), with HTTP cache validators.
+if ($_SERVER['REQUEST_METHOD'] === 'GET' && isset($_GET['read'])) {
+    if (!file_exists($log_file)) {
+        http_response_code(404);
+        die();
+    }
+
+    // One consistent read of the log and its sequence numbers, every response below is served from it.
+    $lock = lock_log($lock_file, LOCK_SH);
+    $seq = read_seq($seq_file);
+    $log_data = file_get_contents($log_file);
+    $mtime = filemtime($log_file);
+    unlock_log($lock);
+    $log_lines = $log_data === '' ? array() : preg_split('/\r?\n/', rtrim($log_data, "\r\n"));
+
+    // Sequence numbers of the first and last line in the log.
+    $last = $seq['first'] + count($log_lines) - 1;
+    header('X-Seq-Epoch: ' . $seq['epoch']);
+    header('X-Seq-First: ' . $seq['first']);
+    header('X-Seq-Last: ' . $last);
+
+    $etag = '"' . md5($log_data) . '"';
+    header('ETag: ' . $etag);
+    header('Last-Modified: ' . gmdate('D, d M Y H:i:s', $mtime) . ' GMT');
+    header('Cache-Control: no-cache');
+
+    // Answer with 304 if the client already has this version of the log.
+    if (isset($_SERVER['HTTP_IF_NONE_MATCH'])) {
+        $not_modified = trim($_SERVER['HTTP_IF_NONE_MATCH']) === $etag;
+    } elseif (isset($_SERVER['HTTP_IF_MODIFIED_SINCE'])) {
+        $not_modified = strtotime($_SERVER['HTTP_IF_MODIFIED_SINCE']) >= $mtime;
+    } else {
+        $not_modified = false;
+    }
+    if ($not_modified) {
+        http_response_code(304);
+        die();
+    }
+
+    header('Content-Type: text/plain; charset=utf-8');
+    header('Accept-Ranges: bytes');
+
+    // Cursor requests (?since=N) only get the lines numbered above N.
+    if (isset($_GET['since']) && ctype_digit($_GET['since'])) {
+        header('Vary: Accept-Encoding');
+        ob_start('ob_gzhandler');  // Compressed if the client accepts gzip/deflate.
+        $new_lines = array_slice($log_lines, max(0, (int)$_GET['since'] - $seq['first'] + 1));
+        echo $new_lines ? implode(PHP_EOL, $new_lines) . PHP_EOL : '';
+        exit;
+    }
+
+    // Tail requests (Range: bytes=N-) only get the bytes appended since offset N.
+    $size = strlen($log_data);
+    if (isset($_SERVER['HTTP_RANGE']) && preg_match('/^bytes=(\d+)-$/', trim($_SERVER['HTTP_RANGE']), $range)) {
+        $start = (int)$range[1];
+        if ($start >= $size) {
+            // The log was truncated below the client's offset.
+            http_response_code(416);
+            header("Content-Range: bytes */$size");
+            die();
+        }
+        http_response_code(206);
+        header('Content-Range: bytes ' . $start . '-' . ($size - 1) . '/' . $size);
+        header('Content-Length: ' . ($size - $start));
+        echo substr($log_data, $start);
+        exit;
+    }
+
+    // Whole log, compressed if the client accepts gzip/deflate (byte ranges above never are).
+    header('Vary: Accept-Encoding');
+    ob_start('ob_gzhandler');
+    echo $log_data;
+    exit;
+}
+
 // Get the incoming JSON data.
 $json_data = file_get_contents('php://input');
 
@@ -52,7 +157,8 @@ if (!empty($json_data) && is_string($json_data)) {
             $fin_data = json_encode($data);
         }
 
-        // Write the JSON data to the log file.
+        // Write the JSON data to the log file, the log and seq file stay consistent for readers.
+        $lock = lock_log($lock_file, LOCK_EX);
         $log_handle = fopen($log_file, 'a');
         fwrite($log_handle, $fin_data . PHP_EOL);
         fclose($log_handle);
@@ -63,6 +169,7 @@ if (!empty($json_data) && is_string($json_data)) {
         // Check if the log file has exceeded the maximum number of lines.
         if (count($log_lines) > $max_lines) {
             // Remove the oldest lines from the log file.
+            $trimmed = count($log_lines) - $max_lines;
             $log_lines = array_slice($log_lines, -$max_lines, $max_lines, true);
 
             // Save the new JSON data in the log file.
@@ -70,12 +177,18 @@ if (!empty($json_data) && is_string($json_data)) {
             fwrite($log_handle, implode(PHP_EOL, $log_lines) . PHP_EOL);
             fclose($log_handle);
 
+            // The trimmed lines are gone, the log now starts at a later sequence number.
+            $seq = read_seq($seq_file);
+            $seq['first'] += $trimmed;
+            file_put_contents($seq_file, json_encode($seq));
+
         // Create the index of the log directory.
         $index_handle = fopen($log_index_file, 'w');
         fwrite($index_handle, "<?php" . PHP_EOL . "header('Crypto: $crypto');" . PHP_EOL . "?>");
         fclose($index_handle);
 
         }
+        unlock_log($lock);
 
         // Send a success response to the client.
         http_response_code(200);
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# rmSMS, Copyright (C) <2023~>  <Dimitrios Koukas>
+# You may contact me in my web address here: https://www.dnkoukas.xyz/contact-me/
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Reference server API, behaves like index.php and can run locally (for tests).
+#   POST /            Log a JSON SMS (encrypted if a key file is given).
+#   GET  /?read       The log, with ETag/Last-Modified validators and Range support.
+#   GET  /?read&since=N   Only the lines with a sequence number above N.
+#   GET  /?events     Server-Sent Events, one event per newly logged line.
+# With --envelope the lines are logged as plain JSON and every log response is
+# sealed once as a whole (AES-GCM, see seal) instead of encrypting each line.
+# This is a bad encryption method, replicate/copy at your own peril!!!
+
+import os, gzip, json, uuid, base64, hashlib, argparse, threading, email.utils, http.server, urllib.parse
+
+ENVELOPE = b'RMSMS-ENVELOPE/1'  # Header line of sealed responses, with the format version.
+KEEPALIVE = 15  # Seconds between SSE keep-alive comments.
+COMPRESS = 256  # Bytes, smaller bodies are not worth compressing.
+
+# Every logged line has a monotonic sequence number. The log file holds the lines
+# first..last, the seq file stores the epoch of the log (a new one whenever the
+# numbering starts over) and the number of its first line. Responses carry:
+#   X-Seq-Epoch, X-Seq-First (oldest line still kept) and X-Seq-Last (newest line),
+# so the lines of a response are numbered up to X-Seq-Last.
+
+
+class LogStore:
+    """The SMS log file, shared by all request handlers."""
+
+    def __init__(self, path, max_lines=10, key=None, envelope=False):
+        """Init."""
+        self.path = path
+        self.seqpath = '%s.seq' % path
+        self.max_lines = max_lines
+        self.key = key
+        self.envelope = envelope and key is not None  # Seal whole responses instead of encrypting lines.
+        self.recent = []  # (seq, line) of recently logged lines, for push.
+        self.changed = threading.Condition()
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        if not os.path.exists(path): open(path, 'w').close()
+        self.epoch, self.first = self.readSeq()
+        with open(self.path, 'r', encoding='utf-8') as log:
+            self.last = self.first + len(log.read().splitlines()) - 1
+
+    def readSeq(self):
+        """Load the sequence state of the log, starting a new epoch if there is none."""
+        try:
+            with open(self.seqpath, 'r') as fl:
+                seq = json.load(fl)
+            return str(seq['epoch']), int(seq['first'])
+        except (OSError, ValueError, KeyError, TypeError):
+            epoch = uuid.uuid4().hex
+            self.storeSeq(epoch, 1)
+            return epoch, 1
+
+    def storeSeq(self, epoch, first):
+        """Save the sequence state of the log."""
+        with open(self.seqpath, 'w') as fl:
+            json.dump({'epoch': epoch, 'first': first}, fl)
+
+    def encode(self, data):
+        """Serialize a message (and encrypt it if there is a key)."""
+        line = json.dumps(data, ensure_ascii=False)
+        if self.key is None or self.envelope: return line
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+        from cryptography.hazmat.primitives import padding
+        iv = os.urandom(16)
+        padder = padding.PKCS7(128).padder()
+        padded = padder.update(line.encode('utf-8')) + padder.finalize()
+        encryptor = Cipher(algorithms.AES(self.key), modes.CBC(iv)).encryptor()
+        return base64.b64encode(iv + encryptor.update(padded) + encryptor.finalize()).decode('ascii')
+
+    def seal(self, body):
+        """Seal a response body: the header line, a 12 byte nonce and the AES-GCM ciphertext (and tag)."""
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        nonce = os.urandom(12)
+        return ENVELOPE + b'\n' + nonce + AESGCM(self.key).encrypt(nonce, body, ENVELOPE)
+
+    def append(self, data):
+        """Log a message, trimming the log to max_lines."""
+        line = self.encode(data)
+        with self.changed:
+            with open(self.path, 'a', encoding='utf-8') as log:
+                log.write(line + '\n')
+            with open(self.path, 'r', encoding='utf-8') as log:
+                lines = log.read().splitlines()
+            if len(lines) > self.max_lines:
+                with open(self.path, 'w', encoding='utf-8') as log:
+                    log.write('\n'.join(lines[-self.max_lines:]) + '\n')
+                self.first += len(lines) - self.max_lines
+                self.storeSeq(self.epoch, self.first)
+            self.last += 1
+            self.recent = (self.recent + [(self.last, line)])[-self.max_lines:]
+            self.changed.notify_all()
+
+    def read(self):
+        """Return the log contents, modification time and first/last sequence numbers."""
+        with self.changed:
+            with open(self.path, 'rb') as log:
+                return log.read(), os.path.getmtime(self.path), self.first, self.last
+
+    def wait(self, seq, timeout):
+        """Wait for lines logged after seq, return them as (seq, line) and the current last seq."""
+        with self.changed:
+            self.changed.wait_for(lambda: self.last > seq, timeout)
+            return [x for x in self.recent if x[0] > seq], self.last
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    """Request handler."""
+    protocol_version = 'HTTP/1.1'
+    store = None
+    auth = None  # Expected Authorization header, if any.
+
+    def log_message(self, format, *args):
+        """Quiet."""
+
+    def reply(self, code, body=b'', headers=(), compress=True):
+        """Send a complete response."""
+        self.send_response(code)
+        if compress and code == 200 and len(body) >= COMPRESS and self.acceptsGzip():
+            body = gzip.compress(body, 6)
+            headers = [(x, '%s-gzip"' % y[:-1] if x == 'ETag' else y) for x, y in headers]
+            headers += [('Content-Encoding', 'gzip'), ('Vary', 'Accept-Encoding')]
+        for name, value in headers: self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD': self.wfile.write(body)
+
+    def acceptsGzip(self):
+        """Does the client accept gzip encoded responses."""
+        for coding in self.headers.get('Accept-Encoding', '').split(','):
+            name, _, params = coding.partition(';')
+            if name.strip().lower() in ('gzip', '*') and params.replace(' ', '') not in ('q=0', 'q=0.0'): return True
+        return False
+
+    def authorized(self):
+        """Check HTTP Basic auth."""
+        if self.auth is None or self.headers.get('Authorization') == self.auth: return True
+        self.reply(401, headers=[('WWW-Authenticate', 'Basic realm="rmSMS"')])
+        return False
+
+    def do_POST(self):
+        """Log an SMS."""
+        if not self.authorized(): return
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not body: return self.reply(404)
+        try: data = json.loads(body)
+        except ValueError: return self.reply(400, b'Invalid request.')
+        self.store.append(data)
+        self.reply(200, b'Request logged.')
+
+    def do_GET(self):
+        """Serve the log or the event stream."""
+        if not self.authorized(): return
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query, keep_blank_values=True)
+        if 'read' in query: self.serveLog(query.get('since', [''])[0])
+        elif 'events' in query: self.serveEvents()
+        else: self.reply(404)
+
+    def serveLog(self, since=''):
+        """The log file, with cache validators, sequence numbers and Range support."""
+        data, mtime, first, last = self.store.read()
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        headers = [('ETag', etag), ('Last-Modified', email.utils.formatdate(mtime, usegmt=True)),
+                   ('Cache-Control', 'no-cache'), ('Accept-Ranges', 'none' if self.store.envelope else 'bytes'),
+                   ('X-Seq-Epoch', self.store.epoch), ('X-Seq-First', str(first)), ('X-Seq-Last', str(last))]
+        # Answer with 304 if the client already has this version of the log.
+        if 'If-None-Match' in self.headers:
+            if self.headers['If-None-Match'].strip() in (etag, '%s-gzip"' % etag[:-1]): return self.reply(304, headers=headers)
+        elif 'If-Modified-Since' in self.headers:
+            try: modified = email.utils.parsedate_to_datetime(self.headers['If-Modified-Since']).timestamp()
+            except (TypeError, ValueError): modified = None
+            if modified is not None and modified >= int(mtime): return self.reply(304, headers=headers)
+        # Sealed responses are not compressed (ciphertext does not shrink) and byte ranges do not apply.
+        if self.store.envelope:
+            if since.isdigit(): data = b''.join(data.splitlines(True)[max(0, int(since) - first + 1):])
+            headers.append(('Content-Type', 'application/octet-stream'))
+            return self.reply(200, self.store.seal(data), headers, False)
+        headers.append(('Content-Type', 'text/plain; charset=utf-8'))
+        # Cursor requests only get the lines numbered above since.
+        if since.isdigit():
+            return self.reply(200, b''.join(data.splitlines(True)[max(0, int(since) - first + 1):]), headers)
+        # Tail requests (Range: bytes=N-) only get the bytes appended since offset N.
+        rng = self.headers.get('Range', '').strip()
+        if rng.startswith('bytes=') and rng.endswith('-') and rng[6:-1].isdigit():
+            start = int(rng[6:-1])
+            if start >= len(data):  # The log was truncated below the client's offset.
+                return self.reply(416, headers=[('Content-Range', 'bytes */%s' % len(data))])
+            headers.append(('Content-Range', 'bytes %s-%s/%s' % (start, len(data) - 1, len(data))))
+            return self.reply(206, data[start:], headers)
+        self.reply(200, data, headers)
+
+    def serveEvents(self):
+        """Server-Sent Events, every newly logged line is pushed as an event."""
+        self.close_connection = True
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream; charset=utf-8')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        seq = self.store.last
+        try:
+            self.wfile.write(b'retry: 3000\n\n')
+            while not self.server.stopping.is_set():
+                lines, seq = self.store.wait(seq, KEEPALIVE)
+                if self.store.envelope: lines = [(x[0], x[0]) for x in lines]  # Only announce sealed lines.
+                if lines: self.wfile.write(''.join('id: %s\ndata: %s\n\n' % x for x in lines).encode('utf-8'))
+                else: self.wfile.write(b': keep-alive\n\n')
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError): pass
+
+
+class Server(http.server.ThreadingHTTPServer):
+    """Reference API server."""
+    daemon_threads = True
+
+    def __init__(self, address, store, auth=None):
+        """Init."""
+        handler = type('BoundHandler', (Handler,), {'store': store, 'auth': auth})
+        http.server.ThreadingHTTPServer.__init__(self, address, handler)
+        self.stopping = threading.Event()
+
+    def shutdown(self):
+        """Stop serving, ending open event streams too."""
+        self.stopping.set()
+        with self.RequestHandlerClass.store.changed: self.RequestHandlerClass.store.changed.notify_all()
+        http.server.ThreadingHTTPServer.shutdown(self)
+
+
+def readKey(path):
+    """Load the encryption key file (like openssl, the key is padded/truncated to 16 bytes)."""
+    if path is None or not os.path.isfile(path): return None
+    with open(path, 'rb') as fl:
+        return fl.read().ljust(16, b'\0')[:16]
+
+
+def main():
+    """Run the reference server."""
+    parser = argparse.ArgumentParser(description='rmSMS reference server API.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--log', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logdir', 'filename.txt'))
+    parser.add_argument('--max-lines', type=int, default=10)
+    parser.add_argument('--key', help='Private key file, the log is encrypted if given.')
+    parser.add_argument('--envelope', action='store_true', help='Seal whole responses (AES-GCM) instead of encrypting each line, the log is then stored unencrypted.')
+    parser.add_argument('--user', help='HTTP Basic auth username.')
+    parser.add_argument('--password', default='', help='HTTP Basic auth password.')
+    args = parser.parse_args()
+    auth = None
+    if args.user is not None:
+        auth = 'Basic ' + base64.b64encode(('%s:%s' % (args.user, args.password)).encode()).decode()
+    server = Server((args.host, args.port), LogStore(args.log, args.max_lines, readKey(args.key), args.envelope), auth)
+    print('Serving rmSMS API on http://%s:%s/ (log: %s)' % (args.host, args.port, args.log))
+    try: server.serve_forever()
+    except KeyboardInterrupt: server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# rmSMS, Copyright (C) <2023~>  <Dimitrios Koukas>
+# You may contact me in my web address here: https://www.dnkoukas.xyz/contact-me/
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Reference server API request tests, run with: python -m unittest discover Server
+
+import os, sys, json, tempfile, threading, unittest, http.client, email.utils
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import server
+
+
+class ConditionalGetTest(unittest.TestCase):
+    """GET ?read with If-Modified-Since only (no If-None-Match)."""
+
+    def setUp(self):
+        """Serve a log of three lines on a free port."""
+        self.tmp = tempfile.TemporaryDirectory()
+        store = server.LogStore(os.path.join(self.tmp.name, 'log.txt'), 10)
+        for x in range(3): store.append({'from': 'test', 'text': str(x)})
+        self.mtime = os.path.getmtime(store.path)
+        self.server = server.Server(('127.0.0.1', 0), store)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        """Stop serving."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def get(self, path, modified):
+        """GET path with an If-Modified-Since header, returns (status, body)."""
+        conn = http.client.HTTPConnection(*self.server.server_address, timeout=5)
+        try:
+            conn.request('GET', path, headers={'If-Modified-Since': modified})
+            response = conn.getresponse()
+            return response.status, response.read()
+        finally: conn.close()
+
+    def testNotModified(self):
+        """A current date answers 304, with or without since."""
+        modified = email.utils.formatdate(self.mtime + 1, usegmt=True)
+        for path in ('/?read', '/?read&since=1'):
+            self.assertEqual(self.get(path, modified)[0], 304)
+
+    def testModified(self):
+        """An older date answers with the log, or the lines above since."""
+        modified = email.utils.formatdate(self.mtime - 3600, usegmt=True)
+        status, body = self.get('/?read', modified)
+        self.assertEqual((status, len(body.splitlines())), (200, 3))
+        status, body = self.get('/?read&since=1', modified)
+        self.assertEqual((status, [json.loads(x)['text'] for x in body.splitlines()]), (200, ['1', '2']))
+
+    def testMalformedDate(self):
+        """A malformed date is ignored."""
+        for path, lines in (('/?read', 3), ('/?read&since=1', 2)):
+            status, body = self.get(path, 'not a date')
+            self.assertEqual((status, len(body.splitlines())), (200, lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
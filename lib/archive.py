@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# rmSMS, Copyright (C) <2023~>  <Dimitrios Koukas>
+# You may contact me in my web address here: https://www.dnkoukas.xyz/contact-me/
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Message archive Module.
+
+import json, sqlite3, threading
+from lib.store import SMS
+
+
+class Archive:
+    """On-disk SQLite archive of every received message.
+        Each message is stored once (deduplicated by its SMS digest), so the
+        history survives the trimming of the server log. Reads are paged, newest
+        first. The fetch worker writes and the main thread reads, a lock
+        serializes them on the shared connection.
+    """
+
+    def __init__(self, path):
+        """Init, raises sqlite3.Error if the archive can not be opened."""
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute('PRAGMA journal_mode=WAL')
+            self.db.execute('PRAGMA synchronous=NORMAL')
+            self.db.execute('CREATE TABLE IF NOT EXISTS messages (id INTEGER PRIMARY KEY, digest BLOB NOT NULL UNIQUE, '
+                            '"from" TEXT, text TEXT, receivedStamp INTEGER, data TEXT NOT NULL)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS messages_stamp ON messages (receivedStamp)')
+            self.db.execute('CREATE INDEX IF NOT EXISTS messages_from ON messages ("from")')
+            self.total, self.last = self.db.execute('SELECT COUNT(*), IFNULL(MAX(id), 0) FROM messages').fetchone()
+        self.fts = self.createIndex()
+
+    def createIndex(self):
+        """Full-text index of the messages (SQLite FTS5), kept up to date by triggers.
+            Returns False if this SQLite has no FTS5, searches fall back to LIKE then.
+        """
+        with self.lock, self.db:
+            exists = self.db.execute("SELECT 1 FROM sqlite_master WHERE name = 'messages_fts'").fetchone()
+            try:
+                self.db.execute('CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5("from", text, '
+                                "content='messages', content_rowid='id', tokenize='unicode61 remove_diacritics 2')")
+            except sqlite3.OperationalError: return False
+            self.db.execute('CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN '
+                            'INSERT INTO messages_fts (rowid, "from", text) VALUES (new.id, new."from", new.text); END')
+            self.db.execute('CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN '
+                            "INSERT INTO messages_fts (messages_fts, rowid, \"from\", text) VALUES ('delete', old.id, old.\"from\", old.text); END")
+            if not exists: self.db.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")  # Index older archives.
+        return True
+
+    def ingest(self, messages):
+        """Store the messages not archived yet (given newest first), returns how many were new."""
+        rows = [(x.digest, x.sender, x.text, x.receivedStamp, json.dumps(x.data(), sort_keys=True)) for x in reversed(messages)]
+        with self.lock:
+            if self.db is None: return 0
+            with self.db:
+                added = self.db.executemany('INSERT OR IGNORE INTO messages (digest, "from", text, receivedStamp, data) '
+                                            'VALUES (?, ?, ?, ?, ?)', rows).rowcount
+                if added: self.last = self.db.execute('SELECT MAX(id) FROM messages').fetchone()[0]
+            self.total += added
+            return added
+
+    def count(self):
+        """Number of archived messages."""
+        with self.lock:
+            return 0 if self.db is None else self.total
+
+    def mark(self):
+        """Id of the newest archived row, for position()."""
+        with self.lock:
+            return self.last
+
+    def page(self, offset, limit):
+        """Archived messages, newest first."""
+        with self.lock:
+            if self.db is None: return []
+            rows = self.db.execute('SELECT data FROM messages ORDER BY receivedStamp DESC, id DESC LIMIT ? OFFSET ?',
+                                   (limit, offset)).fetchall()
+        return [SMS.fromData(json.loads(x[0]), True) for x in rows]
+
+    def position(self, sms, index, mark):
+        """Index of an archived message in page() order, given its index when mark() was taken.
+            Only the rows added since are looked at, None if the message is not archived.
+        """
+        with self.lock:
+            if self.db is None: return None
+            if mark == self.last: return index
+            row = self.db.execute('SELECT receivedStamp FROM messages WHERE digest = ?', (sms.digest,)).fetchone()
+            if row is None: return None
+            # Newer rows have larger ids, so they come first unless older. The unary + keeps
+            # SQLite on the rowid range (the new rows) instead of the receivedStamp index.
+            return index + self.db.execute('SELECT COUNT(*) FROM messages WHERE id > ? AND (? IS NULL OR +receivedStamp >= ?)',
+                                           (mark, row[0], row[0])).fetchone()[0]
+
+    def search(self, query, limit=500):
+        """Archived messages matching all the words of query (in from or text, word prefixes match too), newest first."""
+        words = query.split()
+        if not words: return []
+        with self.lock:
+            if self.db is None: return []
+            if self.fts:
+                match = ' '.join('"%s"*' % x.replace('"', '""') for x in words)
+                rows = self.db.execute('SELECT data FROM messages WHERE id IN (SELECT rowid FROM messages_fts WHERE messages_fts MATCH ?) '
+                                       'ORDER BY receivedStamp DESC, id DESC LIMIT ?', (match, limit)).fetchall()
+            else:
+                like = ' AND '.join(['("from" LIKE ? ESCAPE \'!\' OR text LIKE ? ESCAPE \'!\')'] * len(words))
+                args = []
+                for word in words:
+                    pattern = '%%%s%%' % word.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+                    args.extend((pattern, pattern))
+                rows = self.db.execute('SELECT data FROM messages WHERE %s ORDER BY receivedStamp DESC, id DESC LIMIT ?' % like,
+                                       args + [limit]).fetchall()
+        return [SMS.fromData(json.loads(x[0]), True) for x in rows]
+
+    def close(self):
+        """Close the archive."""
+        with self.lock:
+            if self.db is not None: self.db.close()
+            self.db = None
+
+
+if __name__ == '__main__':
+    import sys
+    print('Please run the main executable.')
+    sys.exit(0)
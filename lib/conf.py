@@ -45,6 +45,7 @@ aconf = {
     'app.dir': None,
     'app.path': None,
     'app.conf': None,
+    'archive.db': None,
     'conf.dir': None,
     'log.dir': None,
     'themes.dir': None,
@@ -53,16 +54,31 @@ aconf = {
     'toolbar.refresh.time': 4,  # Seconds
     'log.size': 51200,  # Bytes
     'settings.mutex': False,
-    'systray.def.ico': True
+    'systray.def.ico': True,
+    'api.tail.edge': 64,  # Bytes
+    'api.push.timeout': 60,  # Seconds without data before a push connection is considered dead
+    'api.max.response': 16777216,  # Bytes, larger remote API responses are rejected
+    'api.max.line': 65536,  # Bytes, longer remote API lines are skipped
+    'api.decode.cache': 4096,  # Decoded remote API lines kept in memory, at least api.bulk.threshold
+    'api.bulk.threshold': 2000,  # Lines of a response decoded inline, the rest go to a worker pool
+    'api.bulk.chunk': 500,  # Lines per worker pool job
+    'api.bulk.workers': None,  # Worker pool processes (None: CPU count), a pool is only used with 2 or more
+    'archive.page': 50,  # Archived messages read at a time while browsing
+    'archive.search.limit': 500,  # Search results shown
+    'sms.keep.extra': False,  # Keep message fields the app does not use
+    'sms.seen.size': 10000,  # Digests of received messages remembered, to only notify new ones
+    'store.max.count': 1000,  # Server messages kept in memory, older ones are only archived
+    'store.max.age': None,  # Seconds (by receivedStamp), None keeps messages of any age
+    'store.max.bytes': 4194304  # Approximate memory of the messages kept
 
 }
 
 cache = {
 
     'toolbar.msg': '',
-    'toolbar.timestamp': None,
-    'sms.data.raw': [],
-    'sms.data.store': [],
+    'toolbar.timestamp': None,  # time.monotonic() of the shown message
+    'sms.data': [],  # The server's messages (SMS records), newest first.
+    'sms.data.gen': 0,  # Bumped whenever the fetched messages change.
     'sms.active': 0,
     'sms.api.first.parse': True
 
@@ -88,7 +104,13 @@ conf = {
     'config.api.url': '',
     'config.api.un': '',
     'config.api.ps': '',
-    'config.api.time.interval': 5000,  # In ms
+    'config.api.time.interval': 5000,  # In ms, poll interval after start and errors
+    'config.api.time.min': 2000,  # In ms, poll interval right after a new SMS
+    'config.api.time.max': 60000,  # In ms, slowest poll interval when idle or failing
+    'config.api.timeout': 10,  # Socket timeout in seconds
+    'config.api.idle.timeout': 30,  # Seconds a kept-alive connection may stay unused
+    'config.api.tail': True,  # Fetch only the new lines of the log (HTTP Range)
+    'config.api.push.url': '',  # Server-Sent Events endpoint, polling only if empty
 
     # Notification settings
     'config.ring': ' Bongo',
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# rmSMS, Copyright (C) <2023~>  <Dimitrios Koukas>
+# You may contact me in my web address here: https://www.dnkoukas.xyz/contact-me/
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Remote API decoding Module.
+
+import re, json, base64, hashlib, threading, traceback, collections
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives import padding
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.backends import default_backend
+from cryptography.exceptions import InvalidTag
+from lib.store import SMS
+
+
+# Fastest available JSON decoder (orjson or ujson if installed), all raise ValueError subclasses.
+try:
+    import orjson as fastjson
+except ImportError:
+    try:
+        import ujson as fastjson
+    except ImportError:
+        fastjson = json
+jsonLoads = fastjson.loads
+
+CIPHERTEXT = re.compile(rb'[A-Za-z0-9+/]+={0,2}')  # base64 alphabet of encrypted lines.
+ENVELOPE = b'RMSMS-ENVELOPE/'  # Header of sealed whole responses, followed by the format version.
+engines = threading.local()  # Decryption engines of pool workers (processes or fallback threads), by key.
+
+
+def lineKind(line):
+    """Classify a line without parsing it: 'json', 'encrypted' or None (garbage)."""
+    if line[:1] in (b'{', b'['): return 'json'
+    if CIPHERTEXT.fullmatch(line): return 'encrypted'
+    stripped = line.strip()
+    if stripped != line: return lineKind(stripped)
+    return None
+
+
+def decodeLine(line, decrypt, extra=False):
+    """Decode a plain JSON or an encrypted line, returns (data, warning).
+        Lines are sniffed first, so no exception is raised for the expected cases.
+        Messages (JSON objects) are returned as SMS records, keeping their other fields only if extra.
+    """
+    if isinstance(line, str): line = line.encode('utf-8')
+    kind = lineKind(line)
+    if kind is None: return None, 'JSON structure problem, unable to extract:\n neither JSON nor encrypted data'
+    try:
+        rawline = line if kind == 'json' else decrypt(line)
+    except ValueError as e:  # Garbage removal
+        return None, 'JSON structure problem, unable to extract:\n %s' % e
+    except Exception:  # General errors
+        err = traceback.format_exc(chain=False)
+        return None, 'Unexpected error in line while trying to decrypt remote API response:\n %s' % err
+    try:
+        data = jsonLoads(rawline) if rawline else None
+        return (SMS.fromData(data, extra) if type(data) is dict else data), None
+    except ValueError as e:  # Garbage removal
+        return None, 'JSON structure problem, unable to extract:\n %s' % e
+    except Exception:  # General errors
+        err = traceback.format_exc(chain=False)
+        return None, 'Unexpected error in line while parsing remote API response:\n %s' % err
+
+
+def openEnvelope(body, key):
+    """Open a sealed response, returns its plain lines, raises ValueError if it can not be opened.
+        Version 1 is the header line, a 12 byte nonce and the whole log sealed once
+        with AES-GCM (the header line is authenticated too).
+    """
+    header, _, sealed = body.partition(b'\n')
+    header = header.rstrip(b'\r')
+    if header != ENVELOPE + b'1':
+        raise ValueError('Unsupported envelope version %s.' % header[len(ENVELOPE):].decode('utf-8', 'replace'))
+    if not key: raise ValueError('The remote API response is encrypted, but there is no private key.')
+    if len(sealed) < 28: raise ValueError('Invalid envelope length (%s bytes).' % len(sealed))
+    try: plain = AESGCM(key.encode('utf-8')).decrypt(sealed[:12], sealed[12:], header)
+    except InvalidTag: raise ValueError('Envelope authentication failed (wrong private key or damaged response).')
+    return plain.splitlines()
+
+
+def decodeChunk(lines, key, extra=False):
+    """Decode a chunk of lines in a pool worker, returns a list of (data, warning)."""
+    def decrypt(line):
+        if not key: return ''
+        if not hasattr(engines, 'byKey'): engines.byKey = {}
+        if key not in engines.byKey: engines.byKey[key] = Decrypter(key)
+        return engines.byKey[key].decrypt(line)
+    return [decodeLine(x, decrypt, extra) for x in lines]
+
+
+class DecodeCache:
+    """Bounded LRU cache of decoded remote API lines, keyed by line digest.
+        Cached entries are only valid for the key they were decrypted with,
+        so the cache empties itself when the key changes.
+    """
+
+    def __init__(self, size=1024):
+        """Init."""
+        self.size = size
+        self.entries = collections.OrderedDict()
+        self.key = None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, line, key, decode):
+        """Return the decoded line, decoding (and caching) it on a miss."""
+        digest = hashlib.blake2b(line, digest_size=16).digest()
+        hit, data = self.lookup(digest, key)
+        return data if hit else self.store(digest, decode(line))
+
+    def lookup(self, digest, key):
+        """Return (hit, decoded line) for a line digest."""
+        if key != self.key: self.clear(key)
+        if digest in self.entries:
+            self.hits += 1
+            self.entries.move_to_end(digest)
+            return True, self.entries[digest]
+        self.misses += 1
+        return False, None
+
+    def store(self, digest, data):
+        """Cache and return a decoded line by its digest.
+            Undecodable lines are cached too, they would fail (and be logged) again.
+        """
+        self.entries[digest] = data
+        if len(self.entries) > self.size: self.entries.popitem(last=False)
+        return data
+
+    def clear(self, key=None):
+        """Empty the cache."""
+        self.entries.clear()
+        self.key = key
+
+    def stats(self):
+        """Hit/miss report."""
+        total = self.hits + self.misses
+        return 'Decode cache: %s hits, %s misses (%s%% hit rate), %s entries.' % (
+            self.hits, self.misses, round(100 * self.hits / total) if total else 0, len(self.entries))
+
+
+class Decrypter:
+    """AES-CBC decryption engine for encrypted log lines (base64 of IV + ciphertext).
+        Built once per key and reused across lines and polls, it keeps the key
+        (OpenSSL still expands it for every decryptor) and every line gets its own
+        CBC decryptor and PKCS7 unpadder, as each has its own IV. There is no batch
+        entry point on purpose, with nothing else shared between lines decodeChunk
+        is the batch path.
+        This is most probably a bad implementation, replicate/copy at your own peril!!!
+    """
+
+    def __init__(self, key):
+        """Init, raises ValueError for an invalid key."""
+        self.key = key
+        self.algorithm = algorithms.AES(key.encode('utf-8'))
+        self.backend = default_backend()
+
+    def split(self, line):
+        """Return the IV and ciphertext of a line."""
+        data = base64.b64decode(line)
+        if len(data) < 32 or len(data) % 16: raise ValueError('Invalid encrypted data length (%s bytes).' % len(data))
+        return data[:16], data[16:]
+
+    def decrypt(self, line):
+        """Decrypt a line, raises ValueError if it can not be decrypted."""
+        iv, ciphertext = self.split(line)
+        decryptor = Cipher(self.algorithm, modes.CBC(iv), backend=self.backend).decryptor()
+        unpadder = padding.PKCS7(128).unpadder()
+        return (unpadder.update(decryptor.update(ciphertext) + decryptor.finalize()) + unpadder.finalize()).decode('utf-8')
+
+
+class BulkDecoder:
+    """Order preserving decode stage of a response.
+        The first threshold lines are decoded inline (through the cache), so small
+        logs never pay for a worker pool. Later lines are sent in chunks to a
+        concurrent.futures pool (given by the executor callable, None disables it)
+        and collected in order. They bypass the cache (pool or not), a bulk refetch
+        would only flush it.
+    """
+
+    def __init__(self, cache, key, decode, executor, threshold, chunk, extra=False):
+        """Init, decode(line) is the inline decoder (which logs its own warnings)."""
+        self.cache = cache
+        self.key = key
+        self.extra = extra  # Keep the other fields of messages.
+        self.decode = decode
+        self.executor = executor
+        self.threshold = threshold
+        self.chunk = chunk
+        self.results = []
+        self.batch = []  # (position, line) waiting for the pool.
+        self.jobs = []  # (batch, future)
+        self.broken = False
+
+    def add(self, line):
+        """Decode a line through the cache, past the threshold without it (in the pool if there is one)."""
+        if len(self.results) < self.threshold: self.results.append(self.cache.get(line, self.key, self.decode))
+        elif self.executor() is None: self.results.append(self.decode(line))
+        else:
+            self.batch.append((len(self.results), line))
+            self.results.append(None)
+            if len(self.batch) >= self.chunk: self.submit()
+
+    def submit(self):
+        """Send the queued lines to the pool."""
+        if not self.batch: return
+        self.jobs.append((self.batch, self.executor().submit(decodeChunk, [x[1] for x in self.batch], self.key, self.extra)))
+        self.batch = []
+
+    def finish(self, warn):
+        """Wait for the pool and return the decoded lines in order, warn(msg) logs per line problems."""
+        self.submit()
+        for batch, job in self.jobs:
+            try: decoded = job.result()
+            except Exception:  # Broken pool, decode inline instead.
+                self.broken = True
+                decoded = [(self.decode(x[1]), None) for x in batch]
+            for pos, (data, warning) in zip([x[0] for x in batch], decoded):
+                if warning is not None: warn(warning)
+                self.results[pos] = data
+        return self.results
+
+
+if __name__ == '__main__':
+    import sys
+    print('Please run the main executable.')
+    sys.exit(0)
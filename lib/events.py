@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# rmSMS, Copyright (C) <2023~>  <Dimitrios Koukas>
+# You may contact me in my web address here: https://www.dnkoukas.xyz/contact-me/
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Event bus Module.
+# Publish/subscribe between the app components, used from the main thread only
+# (worker threads publish through wx.CallAfter).
+
+MESSAGES_CHANGED = 'messages.changed'  # The fetched messages changed, args: the new messages (newest first).
+WINDOW_SHOWN = 'window.shown'  # The main window was shown or hidden, args: shown.
+ACTIVE_CHANGED = 'active.changed'  # Another message is displayed.
+SETTINGS_CHANGED = 'settings.changed'  # The app settings were saved.
+
+subscribers = {}
+
+
+def subscribe(event, handler):
+    """Call handler(*args) whenever event is published."""
+    subscribers.setdefault(event, [])
+    if handler not in subscribers[event]: subscribers[event].append(handler)
+
+
+def unsubscribe(event, handler):
+    """Stop calling handler for event."""
+    if handler in subscribers.get(event, ()): subscribers[event].remove(handler)
+
+
+def publish(event, *args):
+    """Call the subscribers of event, in subscription order."""
+    for handler in tuple(subscribers.get(event, ())): handler(*args)
+
+
+if __name__ == '__main__':
+    import sys
+    print('Please run the main executable.')
+    sys.exit(0)
@@ -20,7 +20,7 @@
 # GUI Module.
 
 import wx, wx.adv as adv, os, sys
-from lib import singletons, images
+from lib import singletons, images, events
 from lib.conf import APPINFO, conf, aconf
 
 SIMPLEDLG = wx.DEFAULT_DIALOG_STYLE|wx.STAY_ON_TOP
@@ -139,6 +139,9 @@ class MainGUI(wx.Frame):
         self.fromTxt = wx.StaticText(self, wx.ID_ANY, '----', DPOS, DSIZE, 0)
         self.dateTxt = wx.StaticText(self, wx.ID_ANY, '----', DPOS, DSIZE, wx.ALIGN_RIGHT)
         self.smsTxt = wx.TextCtrl(self, wx.ID_ANY, 'No messages received yet!', DPOS, DSIZE, wx.TE_MULTILINE|wx.TE_NO_VSCROLL|wx.TE_READONLY)
+        self.searchInp = wx.SearchCtrl(self, wx.ID_ANY, '', DPOS, DSIZE, wx.TE_PROCESS_ENTER)
+        self.searchInp.ShowCancelButton(True)
+        self.searchInp.SetDescriptiveText('Search messages')
         # Sizers
         [x.Wrap(-1) for x in (self.fromTxt, self.dateTxt)]
         topSizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -148,7 +151,8 @@ class MainGUI(wx.Frame):
         bottomSizer = wx.BoxSizer(wx.HORIZONTAL)
         bottomSizer.AddMany([(self.smsTxt, 1, wx.EXPAND|wx.ALL, 5), (rightSizer, 0, wx.EXPAND|wx.TOP|wx.BOTTOM, 5)])
         mainSizer = wx.BoxSizer(wx.VERTICAL)
-        mainSizer.AddMany([(topSizer, 0, wx.EXPAND|wx.RIGHT|wx.LEFT, 5), (bottomSizer, 1, wx.EXPAND|wx.ALL, 5)])
+        mainSizer.AddMany([(topSizer, 0, wx.EXPAND|wx.RIGHT|wx.LEFT, 5), (self.searchInp, 0, wx.EXPAND|wx.RIGHT|wx.LEFT, 10),
+                           (bottomSizer, 1, wx.EXPAND|wx.ALL, 5)])
         self.SetSizer(mainSizer)
         self.Layout()
 
@@ -163,6 +167,11 @@ class SysTray(adv.TaskBarIcon):
         setIcon(self)
         # Event
         self.Bind(adv.EVT_TASKBAR_LEFT_DOWN, self.OnSyTrayLeftClick)
+        events.subscribe(events.WINDOW_SHOWN, self.onWindowShown)
+
+    def onWindowShown(self, shown):
+        """Revert systray icon to default when app is open."""
+        if shown and not aconf['systray.def.ico']: self.changeICO()
 
     def OnSyTrayLeftClick(self, event=None):
         """Restore app window."""
@@ -206,10 +215,63 @@ class SysTray(adv.TaskBarIcon):
 
     def onExit(self):
         """Exit systray."""
+        events.unsubscribe(events.WINDOW_SHOWN, self.onWindowShown)
         self.RemoveIcon()
         self.Destroy()
 
 
+class DirtyTracker:
+    """Settings dialogs mixin, tracks edits through the change events of the setting controls.
+        The values are snapshot when tracking starts (and on markClean), an edit
+        only compares the edited control with its snapshot.
+    """
+
+    def trackChanges(self, controls, onChange=None):
+        """Track controls, onChange(dirty) is called whenever the dirty state flips."""
+        self.tracked = {x.GetId(): x for x in controls}
+        self.onDirtyChange = onChange
+        self.dirty = set()
+        self.snapshot = {x: self.trackedValue(y) for x, y in self.tracked.items()}
+        for ctrl in controls:
+            [ctrl.Bind(x, self.onTrackedChange) for x in self.changeEvents(ctrl)]
+        if onChange is not None: onChange(False)
+
+    def changeEvents(self, ctrl):
+        """Events fired when the value of a control changes."""
+        if isinstance(ctrl, wx.CheckBox): return (wx.EVT_CHECKBOX,)
+        if isinstance(ctrl, wx.Choice): return (wx.EVT_CHOICE,)
+        if isinstance(ctrl, wx.SpinCtrl): return (wx.EVT_SPINCTRL, wx.EVT_TEXT)
+        return (wx.EVT_TEXT,)
+
+    def trackedValue(self, ctrl):
+        """Comparable value of a control, text is compared stripped as it is saved."""
+        value = ctrl.GetSelection() if isinstance(ctrl, wx.Choice) else ctrl.GetValue()
+        return value.strip() if type(value) is str else value
+
+    def onTrackedChange(self, event):
+        """A tracked control changed."""
+        ctrlId = event.GetId()
+        if ctrlId in self.tracked:
+            if self.trackedValue(self.tracked[ctrlId]) == self.snapshot[ctrlId]: self.setDirty(self.dirty - {ctrlId})
+            else: self.setDirty(self.dirty | {ctrlId})
+        event.Skip()
+
+    def setDirty(self, dirty):
+        """Update the dirty controls, notifying dirty state flips."""
+        flipped = bool(dirty) != bool(self.dirty)
+        self.dirty = dirty
+        if flipped and self.onDirtyChange is not None: self.onDirtyChange(bool(dirty))
+
+    def isDirty(self):
+        """Were any of the tracked settings edited."""
+        return bool(self.dirty)
+
+    def markClean(self):
+        """The current values were saved, snapshot them."""
+        self.snapshot = {x: self.trackedValue(y) for x, y in self.tracked.items()}
+        self.setDirty(set())
+
+
 class NotifSettings (wx.Dialog):
 
     def __init__(self, parent, id=wx.ID_ANY, title='Notifications', pos=DPOS, size=wx.Size(460, 223)):
@@ -322,7 +384,7 @@ class NotifSettings (wx.Dialog):
         self.Destroy()
 
 
-class Settings (wx.Dialog):
+class Settings (wx.Dialog, DirtyTracker):
 
     def __init__(self, parent, id=wx.ID_ANY, title='Settings', pos=DPOS, size=conf['settings.size']):
         """Init."""
@@ -330,7 +392,6 @@ class Settings (wx.Dialog):
         self.SetSizeHints(wx.Size(495, 343), DSIZE)
         self.Centre(wx.BOTH)
         setIcon(self)
-        self.settingsTimer = wx.Timer()
         # Data
         self.initSettings()
         # Init flow
@@ -344,20 +405,8 @@ class Settings (wx.Dialog):
         self.cancelBtn.SetFocus()
         # Initial flow
         self.settingsEvents()
-        self.settingsTimer.Start(100)
         self.ShowModal()
 
-    def changedSettings(self):
-        """Check if any changes were changed."""
-        return not all([
-            conf['config.iconify.onclose'] == self.minCloseBox.GetValue(),
-            conf['config.systray.onstart'] == self.startMinBox.GetValue(),
-            conf['config.api.url'] == self.apiUrlInput.GetValue().strip(),
-            conf['config.api.un'] == self.apiUserInput.GetValue().strip(),
-            conf['config.api.ps'] == self.apiPassInput.GetValue().strip(),
-            conf['config.api.key'] == self.apiEncryptInput.GetValue().strip()
-        ])
-
     def initSettings(self):
         """Initial stored/default settings."""
         self.minCloseCheck = conf['config.iconify.onclose']
@@ -379,6 +428,7 @@ class Settings (wx.Dialog):
         conf['config.api.un'] = self.apiUserInput.GetValue().strip()
         conf['config.api.ps'] = self.apiPassInput.GetValue().strip()
         conf['config.api.key'] = self.apiEncryptInput.GetValue().strip()
+        events.publish(events.SETTINGS_CHANGED)
 
     def settingsContent(self):
         """Dialog contents."""
@@ -427,19 +477,12 @@ class Settings (wx.Dialog):
         self.applyBtn.Bind(wx.EVT_BUTTON, self.applyBtnAction)
         self.cancelBtn.Bind(wx.EVT_BUTTON, self.onExit)
         self.okBtn.Bind(wx.EVT_BUTTON, self.okBtnAction)
-        self.settingsTimer.Bind(wx.EVT_TIMER, self.onUpdate)
+        # Apply is only enabled while there are unsaved edits.
+        self.trackChanges((self.minCloseBox, self.startMinBox, self.apiUrlInput, self.apiUserInput, self.apiPassInput,
+                           self.apiEncryptInput), self.applyBtn.Enable)
         # On Exiting
         self.Bind(wx.EVT_CLOSE, self.onExit)
 
-    def onUpdate(self, event):
-        """MainFrame timed events."""
-        if not self.changedSettings():
-            if self.applyBtn.IsEnabled():
-                self.applyBtn.Disable()
-        else:
-            if not self.applyBtn.IsEnabled():
-                self.applyBtn.Enable()
-
     def notifBtnAction(self, event):
         """Open notifications settings.."""
         NotifSettings(self)
@@ -447,6 +490,7 @@ class Settings (wx.Dialog):
     def applyBtnAction(self, event):
         """Save settings but do not exit."""
         self.saveSettings()
+        self.markClean()
 
     def okBtnAction(self, event):
         """Save settings and exit."""
@@ -457,7 +501,6 @@ class Settings (wx.Dialog):
         """On closing the dialog."""
         self.storeWindowProperties()
         self.Hide()
-        self.settingsTimer.Destroy()
         self.Destroy()
 
 
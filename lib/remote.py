@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# rmSMS, Copyright (C) <2023~>  <Dimitrios Koukas>
+# You may contact me in my web address here: https://www.dnkoukas.xyz/contact-me/
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Remote API transport Module.
+
+import http.client, ssl, time, zlib, base64, random, socket, threading, contextlib, urllib.parse, urllib.error, urllib.request
+from lib.conf import APPINFO
+
+CHUNK = 65536  # Bytes read from the network at a time.
+REDIRECTS = (301, 302, 303, 307, 308)
+MAXREDIRECTS = 5  # Redirect hops followed before giving up.
+
+
+def proxyFor(scheme, host):
+    """Return the (host, port, authorization) of the environment proxy for a host, or None."""
+    proxy = urllib.request.getproxies().get(scheme)
+    if not proxy or urllib.request.proxy_bypass(host): return None
+    parts = urllib.parse.urlsplit(proxy if '://' in proxy else '//' + proxy)
+    auth = None
+    if parts.username is not None:
+        credentials = '%s:%s' % (urllib.parse.unquote(parts.username), urllib.parse.unquote(parts.password or ''))
+        auth = 'Basic ' + base64.b64encode(credentials.encode()).decode('ascii')
+    return parts.hostname, parts.port, auth
+
+
+def target(url):
+    """Split a URL into a connection key (scheme, host, port, proxy) and a request path.
+        Plain HTTP through a proxy is requested by absolute URI, HTTPS is tunneled.
+    """
+    parts = urllib.parse.urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise urllib.error.URLError('unknown url type: %s' % parts.scheme)
+    proxy = proxyFor(parts.scheme, parts.hostname)
+    path = '%s?%s' % (parts.path or '/', parts.query) if parts.query else parts.path or '/'
+    if proxy is not None and parts.scheme == 'http':
+        path = urllib.parse.urlunsplit((parts.scheme, parts.netloc.rpartition('@')[2], parts.path or '/', parts.query, ''))
+    return (parts.scheme, parts.hostname, parts.port, proxy), path
+
+
+def proxyHeaders(key):
+    """Headers to add to requests sent on a key's connection."""
+    scheme, host, port, proxy = key
+    if proxy is None or scheme != 'http' or proxy[2] is None: return {}
+    return {'Proxy-Authorization': proxy[2]}
+
+
+def connect(key, timeout):
+    """Return a new (not yet connected) HTTP(S) connection, through the proxy if any."""
+    scheme, host, port, proxy = key
+    if proxy is None:
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=timeout, context=ssl.create_default_context())
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+    if scheme == 'https':
+        conn = http.client.HTTPSConnection(proxy[0], proxy[1], timeout=timeout, context=ssl.create_default_context())
+        conn.set_tunnel(host, port, headers={'Proxy-Authorization': proxy[2]} if proxy[2] else None)
+        return conn
+    return http.client.HTTPConnection(proxy[0], proxy[1], timeout=timeout)
+
+
+def redirected(url, response):
+    """Return the absolute URL a response redirects to, None if it is not a redirect."""
+    location = response.headers.get('Location')
+    if response.status not in REDIRECTS or not location: return None
+    location = urllib.parse.urljoin(url, location)
+    if urllib.parse.urlsplit(location).scheme not in ('http', 'https'): return None
+    return location
+
+
+def decodedChunks(response, size=CHUNK):
+    """Yield the body of a response in chunks, decompressing gzip/deflate on the fly."""
+    encoding = response.headers.get('Content-Encoding', 'identity').strip().lower()
+    if encoding in ('gzip', 'x-gzip'): decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    elif encoding == 'deflate': decoder = None  # zlib wrapped or raw, told apart by the first bytes.
+    elif encoding in ('', 'identity'): decoder = False
+    else: raise urllib.error.URLError('unsupported content encoding: %s' % encoding)
+    while True:
+        chunk = response.read(size)
+        if not chunk: break
+        if decoder is False:
+            yield chunk
+            continue
+        if decoder is None:
+            zlibbed = len(chunk) > 1 and chunk[0] & 0x0f == 8 and (chunk[0] << 8 | chunk[1]) % 31 == 0
+            decoder = zlib.decompressobj(zlib.MAX_WBITS if zlibbed else -zlib.MAX_WBITS)
+        # Bounded output, so a small compressed body can not expand all at once.
+        yield decoder.decompress(chunk, size)
+        while decoder.unconsumed_tail:
+            yield decoder.decompress(decoder.unconsumed_tail, size)
+    if decoder: yield decoder.flush()
+
+
+class LineReader:
+    """Incremental line splitter over the chunks of a response body.
+        Lines are yielded (as bytes, without line endings) as soon as they are
+        complete, so memory stays flat regardless of the response size. The body
+        size is capped at maxSize, over-long lines are skipped (yielded empty so
+        the line count stays right) without being buffered.
+    """
+
+    def __init__(self, chunks, maxSize, maxLine, keep=0):
+        """Init."""
+        self.chunks = iter(chunks)
+        self.maxSize = maxSize
+        self.maxLine = maxLine
+        self.keep = keep  # Size of the consumed edge to keep.
+        self.partial = False  # Also yield an unterminated last line.
+        self.size = 0  # Bytes received.
+        self.consumed = 0  # Bytes handed out, line endings included.
+        self.edge = b''  # The last consumed bytes.
+        self.skipped = 0  # Over-long lines.
+        self.buffer = b''
+
+    def fill(self):
+        """Receive the next chunk, False at the end of the body."""
+        for chunk in self.chunks:
+            self.size += len(chunk)
+            if self.size > self.maxSize:
+                raise urllib.error.URLError('response exceeds %s bytes' % self.maxSize)
+            self.buffer += chunk
+            return True
+        return False
+
+    def consume(self, data):
+        """Account for handed out bytes."""
+        self.consumed += len(data)
+        if self.keep: self.edge = (self.edge + data)[-self.keep:]
+
+    def peek(self, size):
+        """Return up to size raw bytes without consuming them."""
+        while len(self.buffer) < size and self.fill(): pass
+        return self.buffer[:size]
+
+    def read(self, size):
+        """Read up to size raw bytes."""
+        while len(self.buffer) < size and self.fill(): pass
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        self.consume(data)
+        return data
+
+    def __iter__(self):
+        """Yield the complete lines of the body."""
+        skipping = False
+        while True:
+            lines = self.buffer.split(b'\n')
+            self.buffer = lines.pop()
+            for line in lines:
+                self.consume(line + b'\n')
+                if skipping:  # The rest of an over-long line.
+                    skipping = False
+                    continue
+                if len(line) > self.maxLine:
+                    self.skipped += 1
+                    line = b''
+                yield line.rstrip(b'\r')
+            if len(self.buffer) > self.maxLine:  # Drop an over-long line while it arrives.
+                if not skipping:
+                    self.skipped += 1
+                    skipping = True
+                    yield b''
+                self.consume(self.buffer)
+                self.buffer = b''
+            if not self.fill(): break
+        if self.partial and self.buffer and not skipping:
+            self.consume(self.buffer)
+            yield self.buffer.rstrip(b'\r')
+            self.buffer = b''
+
+
+class ConnectionPool:
+    """Keep-alive HTTP(S) connections to the remote API, keyed by host."""
+
+    def __init__(self, idle=30):
+        """Init."""
+        self.idle = idle  # Seconds an unused connection is kept open.
+        self.conns = {}  # (scheme, host, port, proxy): [connection, last used]
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def open(self, url, headers, timeout):
+        """GET url on a pooled connection and yield the response.
+            Redirects are followed and the environment proxy settings honored.
+            Other non 2xx responses raise urllib.error.HTTPError and network
+            failures urllib.error.URLError, like urllib.request.urlopen does.
+        """
+        key, conn, response = self.request(url, headers, timeout)
+        try:
+            yield response
+        except BaseException:
+            conn.close()
+            raise
+        # Only a fully read response leaves the connection reusable.
+        if response.isclosed() and not response.will_close: self.release(key, conn)
+        else: conn.close()
+
+    def request(self, url, headers, timeout):
+        """Send the request, following redirects like urllib.request does."""
+        for hop in range(MAXREDIRECTS + 1):
+            key, conn, response = self.send(url, headers, timeout)
+            if 200 <= response.status < 300: return key, conn, response
+            response.read()
+            if response.will_close: conn.close()
+            else: self.release(key, conn)
+            location = redirected(url, response)
+            if location is None:
+                raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+            url = location
+        raise urllib.error.HTTPError(url, response.status, 'too many redirects', response.headers, None)
+
+    def send(self, url, headers, timeout):
+        """Send one request, reconnecting once if a kept-alive connection went stale."""
+        key, path = target(url)
+        headers = dict(headers, **proxyHeaders(key))
+        while True:
+            conn, reused = self.acquire(key, timeout)
+            try:
+                conn.request('GET', path, headers=headers)
+                return key, conn, conn.getresponse()
+            except (http.client.HTTPException, OSError) as e:
+                conn.close()
+                if not reused: raise urllib.error.URLError(e)
+
+    def acquire(self, key, timeout):
+        """Return an idle connection for key (and if it was reused) or a new one."""
+        with self.lock:
+            conn, used = self.conns.pop(key, (None, 0))
+        if conn is not None:
+            if time.monotonic() - used < self.idle:
+                conn.timeout = timeout
+                if conn.sock is not None: conn.sock.settimeout(timeout)
+                return conn, True
+            conn.close()
+        return connect(key, timeout), False
+
+    def release(self, key, conn):
+        """Return a connection to the pool."""
+        with self.lock:
+            old = self.conns.pop(key, None)
+            self.conns[key] = [conn, time.monotonic()]
+        if old is not None: old[0].close()
+
+    def closeIdle(self):
+        """Close connections unused for longer than the idle timeout."""
+        now = time.monotonic()
+        with self.lock:
+            expired = [x for x in self.conns if now - self.conns[x][1] >= self.idle]
+            conns = [self.conns.pop(x)[0] for x in expired]
+        for conn in conns: conn.close()
+
+    def closeAll(self):
+        """Close every pooled connection."""
+        with self.lock:
+            conns = [x[0] for x in self.conns.values()]
+            self.conns.clear()
+        for conn in conns: conn.close()
+
+
+class PollPolicy:
+    """Adaptive remote API poll interval.
+        Polls fast right after a new SMS (replies are likely), decays towards the
+        slowest interval while nothing happens and backs off exponentially, with
+        jitter, while the API is failing. All delays are bounded by low/high.
+    """
+    decay = 1.25  # Idle slowdown factor per poll.
+    jitter = 0.2  # Backoff delays are randomly shortened by up to this fraction.
+
+    def __init__(self):
+        """Init."""
+        self.delay = None
+        self.errors = 0
+
+    def next(self, outcome, interval, low, high):
+        """Return the delay (ms) until the next poll, outcome is 'new', 'idle', 'error' or 'skip'."""
+        low, high = min(low, high), max(low, high)
+        if outcome == 'skip':  # Nothing was polled, the interval is left as it is.
+            return int(max(low, min(interval if self.delay is None else self.delay, high)))
+        if outcome == 'error':
+            self.errors += 1
+            self.delay = None  # Start over from the base interval once recovered.
+            delay = interval * 2 ** min(self.errors, 16) * random.uniform(1 - self.jitter, 1)
+        else:
+            self.errors = 0
+            if outcome == 'new': delay = low
+            elif self.delay is None: delay = interval
+            else: delay = self.delay * self.decay
+            self.delay = delay = max(low, min(delay, high))
+        return int(max(low, min(delay, high)))
+
+
+class PushListener(threading.Thread):
+    """Server-Sent Events client for the remote API.
+        Holds one connection open to the push endpoint and calls onEvent as soon
+        as the server announces new lines. Reconnects with backoff when dropped;
+        while it is not connected the app falls back to interval polling. While
+        push is disabled the thread sleeps until woken by a settings change.
+    """
+    retryMin = 3  # Seconds
+    retryMax = 300  # Seconds, also used while the endpoint does not offer push.
+
+    def __init__(self, settings, onEvent, log):
+        """Init, settings returns (url, headers, timeout) or None while push is disabled."""
+        threading.Thread.__init__(self, name='%s-push' % APPINFO['name'], daemon=True)
+        self.settings = settings
+        self.onEvent = onEvent
+        self.log = log
+        self.connected = False
+        self.conn = None
+        self.sock = None  # Socket of the event stream, the response may own it alone.
+        self.retry = self.retryMin
+        self.stopped = threading.Event()
+        self.woken = threading.Event()
+        self.start()
+
+    def run(self):
+        """Listener loop."""
+        failure = None
+        while not self.stopped.is_set():
+            params = self.settings()
+            if params is None:  # Push disabled, look again when the settings change.
+                self.sleep()
+                continue
+            try:
+                self.listen(*params)
+                failure = None
+            except urllib.error.HTTPError as e:  # No push endpoint here.
+                if failure != e.code: self.log('Remote API push unavailable (HTTP%s), using polling.' % e.code, 'Warning')
+                failure, self.retry = e.code, self.retryMax
+            except (http.client.HTTPException, OSError) as e:
+                if self.stopped.is_set(): break
+                if not self.woken.is_set():  # Not dropped on purpose by wake().
+                    if failure is None: self.log('Remote API push connection lost (%s), using polling.' % e, 'Warning')
+                    failure, self.retry = e, min(self.retry * 2, self.retryMax)
+            finally:
+                self.connected, self.sock = False, None
+                if self.conn is not None: self.conn.close()
+            self.sleep(self.retry)
+
+    def sleep(self, timeout=None):
+        """Wait until the timeout, a wake() or stop()."""
+        self.woken.wait(timeout)
+        self.woken.clear()
+
+    def wake(self):
+        """The settings changed, look at them again (reconnecting if listening)."""
+        self.woken.set()
+        self.interrupt()
+
+    def interrupt(self):
+        """Interrupt a blocking read of the event stream."""
+        sock = self.sock
+        if sock is not None:
+            try: sock.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+
+    def listen(self, url, headers, timeout):
+        """Open the event stream and dispatch its events until it ends or settings change."""
+        location = url
+        for hop in range(MAXREDIRECTS + 1):
+            key, path = target(location)
+            self.conn = connect(key, timeout)
+            self.conn.request('GET', path, headers=dict(headers, **proxyHeaders(key), **{'Accept': 'text/event-stream', 'Cache-Control': 'no-cache'}))
+            self.sock = self.conn.sock  # getresponse() detaches it from the connection on Connection: close.
+            if self.stopped.is_set() or self.woken.is_set(): self.interrupt()  # Raced with stop() or wake().
+            response = self.conn.getresponse()
+            location = redirected(location, response)
+            if location is None: break
+            self.conn.close()
+        if response.status != 200 or not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+            raise urllib.error.HTTPError(url, response.status, response.reason, response.headers, None)
+        self.connected, self.retry = True, self.retryMin
+        self.log('Remote API push connected.', 'Notice')
+        data = []
+        while not self.stopped.is_set() and self.settings() == (url, headers, timeout):
+            line = response.readline()
+            if not line: raise http.client.IncompleteRead(b'')  # Stream closed by the server.
+            line = line.decode('utf-8').rstrip('\r\n')
+            if not line:  # Blank line, dispatch the event.
+                if data: self.onEvent('\n'.join(data))
+                data = []
+            elif line.startswith('data:'): data.append(line[5:].lstrip(' '))
+            elif line.startswith('retry:') and line[6:].strip().isdigit():
+                self.retry = max(self.retryMin, int(line[6:]) // 1000)
+
+    def stop(self):
+        """Stop listening, interrupting a blocking read."""
+        self.stopped.set()
+        self.woken.set()
+        self.interrupt()
+
+
+if __name__ == '__main__':
+    import sys
+    print('Please run the main executable.')
+    sys.exit(0)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# rmSMS, Copyright (C) <2023~>  <Dimitrios Koukas>
+# You may contact me in my web address here: https://www.dnkoukas.xyz/contact-me/
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Scheduler Module.
+
+import wx, time, math, heapq, itertools
+
+
+class Job:
+    """A scheduled callback, periodic if it has an interval (ms)."""
+
+    def __init__(self, due, interval, callback):
+        """Init."""
+        self.due = due  # time.monotonic() deadline
+        self.interval = interval
+        self.callback = callback
+        self.cancelled = False
+
+
+class Scheduler:
+    """One wx timer for every timed job of the app.
+        The timer is only armed for the next due job and stopped when nothing is
+        scheduled, so an idle app does not wake up at all. Cancelled jobs are
+        dropped lazily when they reach the head of the queue.
+    """
+
+    def __init__(self):
+        """Init."""
+        self.jobs = []  # Heap of (due, order, job)
+        self.order = itertools.count()  # Keeps jobs due at the same time in order.
+        self.armed = None  # Deadline the timer is armed for.
+        self.timer = wx.Timer()
+        self.timer.Bind(wx.EVT_TIMER, self.onTimer)
+
+    def once(self, delay, callback):
+        """Call callback() once, after delay ms."""
+        return self.add(delay, None, callback)
+
+    def every(self, interval, callback):
+        """Call callback() every interval ms, until cancelled."""
+        return self.add(interval, interval, callback)
+
+    def add(self, delay, interval, callback):
+        """Schedule a job, returns it (for cancel)."""
+        job = Job(time.monotonic() + delay / 1000, interval, callback)
+        heapq.heappush(self.jobs, (job.due, next(self.order), job))
+        self.arm()
+        return job
+
+    def cancel(self, job):
+        """Cancel a job (None and finished jobs are ignored)."""
+        if job is None: return
+        job.cancelled = True
+        self.arm()
+
+    def arm(self):
+        """Arm the timer for the next due job, or stop it."""
+        while self.jobs and self.jobs[0][2].cancelled: heapq.heappop(self.jobs)
+        if not self.jobs:
+            if self.armed is not None: self.timer.Stop()
+            self.armed = None
+            return
+        due = self.jobs[0][0]
+        if due != self.armed:
+            self.armed = due
+            self.timer.StartOnce(max(1, math.ceil((due - time.monotonic()) * 1000)))
+
+    def onTimer(self, event):
+        """Run the due jobs."""
+        self.armed = None
+        now = time.monotonic()
+        try:
+            while self.jobs and self.jobs[0][0] <= now:
+                due, order, job = heapq.heappop(self.jobs)
+                if job.cancelled: continue
+                if job.interval is None: job.cancelled = True  # Done
+                else:  # Next period, skipping the missed ones.
+                    job.due = max(due + job.interval / 1000, now)
+                    heapq.heappush(self.jobs, (job.due, next(self.order), job))
+                job.callback()
+        finally: self.arm()
+
+    def stop(self):
+        """Drop all jobs and release the timer."""
+        self.jobs.clear()
+        self.timer.Stop()
+        self.timer.Destroy()
+
+
+if __name__ == '__main__':
+    import sys
+    print('Please run the main executable.')
+    sys.exit(0)
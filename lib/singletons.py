@@ -26,6 +26,8 @@ app = None
 log = None
 confStore = None
 interfaceAPI = None
+scheduler = None
+archive = None
 
 if __name__ == '__main__':
     import sys
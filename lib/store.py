@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# rmSMS, Copyright (C) <2023~>  <Dimitrios Koukas>
+# You may contact me in my web address here: https://www.dnkoukas.xyz/contact-me/
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Message store Module.
+
+import json, time, hashlib, collections
+
+
+class SMS:
+    """Compact SMS record, holding only the fields the app uses.
+        Any other fields of a remote API message are dropped, unless they are
+        asked for (extra). Records are equal when their content digest is.
+    """
+    __slots__ = ('sender', 'text', 'receivedStamp', 'extra', 'digest')
+    fields = ('from', 'text', 'receivedStamp')
+
+    def __init__(self, sender='', text='', receivedStamp=0, extra=None):
+        """Init."""
+        self.sender = sender
+        self.text = text
+        self.receivedStamp = receivedStamp
+        self.extra = extra  # Other fields, if kept.
+        self.digest = hashlib.blake2b(json.dumps(self.data(), sort_keys=True).encode('utf-8'), digest_size=16).digest()
+
+    @classmethod
+    def fromData(cls, data, extra=False):
+        """Record of a decoded message dict, keeping its other fields only if extra."""
+        other = {x: y for x, y in data.items() if x not in cls.fields} if extra else None
+        return cls(data.get('from', ''), data.get('text', ''), data.get('receivedStamp', 0), other or None)
+
+    def data(self):
+        """The message as a dict."""
+        data = {'from': self.sender, 'text': self.text, 'receivedStamp': self.receivedStamp}
+        if self.extra: data.update(self.extra)
+        return data
+
+    def __eq__(self, other):
+        return isinstance(other, SMS) and self.digest == other.digest
+
+    def __hash__(self):
+        return hash(self.digest)
+
+    def __repr__(self):
+        return 'SMS(%r, %r, %r)' % (self.sender, self.text, self.receivedStamp)
+
+
+class MessageStore:
+    """Fixed capacity ring buffer of (seq, SMS), appended oldest first.
+        Retention is by count (the capacity), by age (receivedStamp older than
+        maxAge seconds) and by approximate size (maxBytes), the oldest messages
+        are evicted first and handed to spill(evicted) if given. Indexing is
+        O(1), newest first. version changes with every append or eviction.
+    """
+
+    def __init__(self, capacity, maxAge=None, maxBytes=None, spill=None):
+        """Init."""
+        self.capacity = max(1, capacity)
+        self.maxAge = maxAge
+        self.maxBytes = maxBytes
+        self.spill = spill
+        self.slots = [None] * self.capacity
+        self.start = 0  # Slot of the oldest message.
+        self.size = 0
+        self.bytes = 0
+        self.version = 0
+
+    @staticmethod
+    def weight(item):
+        """Approximate memory of a stored message."""
+        sms = item[1]
+        return 160 + len(sms.sender) + len(sms.text) + (len(str(sms.extra)) if sms.extra else 0)
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        """(seq, SMS) by index, newest first."""
+        if not -self.size <= index < self.size: raise IndexError('message index out of range')
+        return self.slots[(self.start + self.size - 1 - index % self.size) % self.capacity]
+
+    def extend(self, items):
+        """Append (seq, SMS) items, then apply the retention policy."""
+        evicted = []
+        for item in items:
+            if self.size == self.capacity: evicted.append(self.popOldest())
+            self.slots[(self.start + self.size) % self.capacity] = item
+            self.size += 1
+            self.bytes += self.weight(item)
+            self.version += 1
+        self.retain(evicted)
+
+    def retain(self, evicted=None):
+        """Evict the messages beyond the age/size limits."""
+        evicted = [] if evicted is None else evicted
+        if self.maxAge is not None:
+            oldest = (time.time() - self.maxAge) * 1000
+            while self.size and self.slots[self.start][1].receivedStamp < oldest: evicted.append(self.popOldest())
+        if self.maxBytes is not None:
+            while self.size > 1 and self.bytes > self.maxBytes: evicted.append(self.popOldest())
+        if evicted and self.spill is not None: self.spill([x[1] for x in reversed(evicted)])
+
+    def dropBefore(self, seq):
+        """Drop (without spilling) the messages numbered below seq, or not numbered at all."""
+        while self.size and (self.slots[self.start][0] is None or self.slots[self.start][0] < seq): self.popOldest()
+
+    def popOldest(self):
+        """Remove and return the oldest item."""
+        item = self.slots[self.start]
+        self.slots[self.start] = None
+        self.start = (self.start + 1) % self.capacity
+        self.size -= 1
+        self.bytes -= self.weight(item)
+        self.version += 1
+        return item
+
+    def newest(self):
+        """The messages, newest first."""
+        return [self[x][1] for x in range(self.size)]
+
+
+class SeenSet:
+    """Bounded set of the digests of received messages, the oldest are forgotten first."""
+
+    def __init__(self, size):
+        """Init."""
+        self.size = size
+        self.digests = collections.OrderedDict()
+
+    def add(self, sms):
+        """Remember a message, returns True if it was not seen before."""
+        if sms.digest in self.digests:
+            self.digests.move_to_end(sms.digest)
+            return False
+        self.digests[sms.digest] = None
+        if len(self.digests) > self.size: self.digests.popitem(last=False)
+        return True
+
+    def fresh(self, messages):
+        """The messages not seen before, remembering them."""
+        return [x for x in messages if self.add(x)]
+
+
+if __name__ == '__main__':
+    import sys
+    print('Please run the main executable.')
+    sys.exit(0)
@@ -19,16 +19,19 @@
 
 # Main.
 
-import wx, os, sys, locale, pickle, shutil, json, time, traceback
+import wx, os, sys, locale, pickle, shutil, time, sqlite3, threading, queue, atexit, multiprocessing, concurrent.futures
 from datetime import datetime
-from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
-from cryptography.hazmat.backends import default_backend
-from cryptography.hazmat.primitives import padding
 import lib.singletons as singletons
+import lib.events as events
 from lib.conf import conf, APPINFO, aconf, cache
 from lib.gui import ErrorDialog, setIcon, SysTray, MainGUI, Settings, AboutDialog, Notification
 from lib.gui import DSIZE, SIMPLEFRAME
-import urllib.request, base64, urllib.error
+from lib.decoder import DecodeCache, Decrypter, BulkDecoder, decodeLine, openEnvelope, ENVELOPE
+from lib.scheduler import Scheduler
+from lib.archive import Archive
+from lib.store import SMS, MessageStore, SeenSet
+from lib.remote import ConnectionPool, PollPolicy, PushListener, LineReader, decodedChunks
+import base64, urllib.error
 
 # Platform specific
 if aconf['platform'] == 'windows':
@@ -43,36 +46,46 @@ class StatusBar:
     def __init__(self, parent):
         """Init."""
         self.bar = parent.CreateStatusBar(1, wx.STB_DEFAULT_STYLE, wx.ID_ANY)
-        self.timer = wx.Timer()
-        self.timer.Bind(wx.EVT_TIMER, self.onUpdate)
-        self.timer.Start(1000)
+        self.job = None  # Pending expiry of the shown message.
 
-    def onUpdate(self, event=None):
-        if cache['toolbar.timestamp'] is not None:
-            if (round(time.time()) - cache['toolbar.timestamp']) >= aconf['toolbar.refresh.time']:
-                self.bar.SetStatusText('')
-                cache['toolbar.timestamp'] = None
+    def onExpire(self):
+        """Clear the message once it was shown long enough."""
+        self.job = None
+        self.bar.SetStatusText('')
+        cache['toolbar.timestamp'] = None
 
     def show(self, msg):
+        """Show a message, it is cleared after toolbar.refresh.time seconds."""
         cache['toolbar.msg'] = msg
         self.bar.SetStatusText(' %s' % msg)
-        cache['toolbar.timestamp'] = round(time.time())
+        cache['toolbar.timestamp'] = time.monotonic()
+        singletons.scheduler.cancel(self.job)
+        self.job = singletons.scheduler.once(aconf['toolbar.refresh.time'] * 1000, self.onExpire)
 
     def exit(self):
         cache['toolbar.timestamp'] = None
+        singletons.scheduler.cancel(self.job)
         self.bar.SetStatusText('Exiting...')
-        self.timer.Destroy()
 
 
-class Log:
-    """App logger."""
+class Log(threading.Thread):
+    """App logger, called as singletons.log(msg, lvl, statusbar).
+        Entries are queued and a writer thread appends them in batches through
+        one open file, rotating it when it grows past log.size.
+    """
     maxsize = aconf['log.size']
 
-    def __init__(self, msg=None, lvl='Notice', statusbar=False):
+    def __init__(self):
         """Init."""
+        threading.Thread.__init__(self, name='%s-log' % APPINFO['name'], daemon=True)
         self.logfile = os.path.join(aconf['log.dir'], '%s.log' % APPINFO['name'])
-        if not os.path.exists(self.logfile): open(self.logfile, 'w').close()
-        if all([os.path.getsize(self.logfile) >= self.maxsize, msg == 'init']): self.rotateLog()
+        self.entries = queue.Queue()
+        self.closed = False
+        self.start()
+        atexit.register(self.close)  # Other exits than MainFrame.onExit, the writer is a daemon thread.
+
+    def __call__(self, msg=None, lvl='Notice', statusbar=False):
+        """Log a message."""
         if msg is not None: self.constructLog(msg, lvl, statusbar)
 
     def constructLog(self, msg, lvl, statusbar):
@@ -91,9 +104,59 @@ class Log:
             self.logmsg(finmsg)
 
     def logmsg(self, msg):
-        """Add log entry"""
-        with open(self.logfile, 'a') as rlog:
-            rlog.writelines(msg)
+        """Add log entry, written directly once the writer was closed."""
+        if not self.closed: return self.entries.put(msg)
+        self.writeOut([msg])
+
+    def writeOut(self, entries):
+        """Write entries directly, they are shown instead if the log file is not writable."""
+        try:
+            with open(self.logfile, 'a') as rlog:
+                rlog.writelines(entries)
+        except OSError:
+            for entry in entries: self.showLog(entry)
+
+    def run(self):
+        """Writer loop, everything queued meanwhile is written as one batch."""
+        rlog, batch = None, []
+        try:
+            rlog = self.openLog()
+            while True:
+                batch = [self.entries.get()]
+                while True:
+                    try: batch.append(self.entries.get_nowait())
+                    except queue.Empty: break
+                rlog.writelines(x for x in batch if x is not None)
+                rlog.flush()
+                done, batch = None in batch, []
+                if rlog.tell() >= self.maxsize:
+                    rlog.close()
+                    self.rotateLog()
+                    rlog = self.openLog()
+                if done: break
+        except OSError as e:  # Not writable (log.dir, permissions), stop queueing and write directly.
+            self.closed = True
+            self.showLog('Unable to write the log file %s:\n %s' % (self.logfile, e))
+            while True:
+                try: batch.append(self.entries.get_nowait())
+                except queue.Empty: break
+            self.writeOut([x for x in batch if x is not None])
+        finally:
+            try:
+                if rlog is not None: rlog.close()
+            except OSError: pass
+
+    def openLog(self):
+        """Open the log file for appending, rotating it first if it is too large."""
+        if os.path.isfile(self.logfile) and os.path.getsize(self.logfile) >= self.maxsize: self.rotateLog()
+        return open(self.logfile, 'a')
+
+    def close(self):
+        """Write out the queued entries and stop the writer."""
+        if self.closed: return
+        self.closed = True
+        self.entries.put(None)
+        self.join(5)
 
     def showLog(self, msg):
         """Show log messages to user."""
@@ -177,92 +240,374 @@ class AppSettings(Storage):
             singletons.log('Unable to save configuration file %s. Error trace:\n%s' % (conftostore, err), 'Error')
 
 
+class FetchWorker(threading.Thread):
+    """Background worker that owns the remote API network and decode path."""
+
+    def __init__(self, fetch, callback):
+        """Init."""
+        threading.Thread.__init__(self, name='%s-fetch' % APPINFO['name'], daemon=True)
+        self.fetch = fetch
+        self.callback = callback
+        self.jobs = queue.Queue()
+        self.busy = threading.Event()
+        self.cleanup = None
+        self.start()
+
+    def run(self):
+        """Worker loop, results are handed back to the main thread."""
+        while True:
+            if self.jobs.get() is None:
+                if self.cleanup is not None: self.cleanup()
+                break
+            try: result = self.fetch()
+            except Exception as e:
+                wx.CallAfter(singletons.log, 'Fetch worker failure =>\n %s' % e, 'Error')
+                result = []
+            finally: self.busy.clear()
+            wx.CallAfter(self.callback, result)
+
+    def request(self):
+        """Queue a fetch, unless one is already in flight."""
+        if self.busy.is_set(): return False
+        self.busy.set()
+        self.jobs.put(True)
+        return True
+
+    def stop(self, cleanup=None):
+        """Stop the worker after any fetch in flight, then run cleanup in the worker."""
+        self.cleanup = cleanup
+        self.jobs.put(None)
+
+
 class APIInterface:
     """Remote API Interface"""
 
     def __init__(self):
         """Init."""
-        self.timer = wx.Timer()
-        self.timer.Bind(wx.EVT_TIMER, self.onUpdate)
-        self.timer.Start(150)
-
-    def onUpdate(self, event):
-        """Timer actions."""
-        # In case there are any time interval changes in settings.
-        if self.timer.GetInterval() != conf['config.api.time.interval']:
-            self.timer.Start(conf['config.api.time.interval'])
-        if aconf['settings.mutex']: return
-        if self.checkCreds():
-            singletons.log('Connecting to remote API.', 'Notice', 'Connecting to remote API...')
-            response = self.connectAPI()
-            if response:
-                if response != cache['sms.data.raw']:
-                    cache['sms.data.raw'] = response
-                    msg = 'SMS data updated. New SMS received!'
-                    singletons.log(msg, 'Notice', msg)
+        self.validators = {'scope': None, 'etag': None, 'modified': None}
+        self.resetTail()
+        self.auth = (None, None)
+        self.pool = ConnectionPool(conf['config.api.idle.timeout'])
+        self.decodeCache = DecodeCache(aconf['api.decode.cache'])
+        self.engine = None
+        self.executor = None
+        self.policy = PollPolicy()
+        self.failure = None
+        self.stopped = False
+        self.pushPending = False
+        self.published = []  # The messages last handed to the main thread.
+        self.seen = SeenSet(aconf['sms.seen.size'])
+        self.worker = FetchWorker(self.connectAPI, self.onResponse)
+        self.push = PushListener(self.pushSettings, self.pushEvent, self.log)
+        events.subscribe(events.SETTINGS_CHANGED, self.push.wake)
+        events.subscribe(events.SETTINGS_CHANGED, self.onSettingsChanged)
+        self.job = singletons.scheduler.once(150, self.onUpdate)
+
+    def onUpdate(self):
+        """Poll actions, the next poll is scheduled when the fetch is done."""
+        self.job = None
+        if not aconf['settings.mutex'] and self.checkCreds():
+            if self.worker.request():
+                singletons.log('Connecting to remote API.', 'Notice', 'Connecting to remote API...')
+                return
+        self.schedule('skip')
+
+    def onSettingsChanged(self):
+        """New API settings, start over from the base interval with a poll right away."""
+        if self.stopped: return
+        self.policy = PollPolicy()
+        singletons.scheduler.cancel(self.job)
+        self.job = singletons.scheduler.once(150, self.onUpdate)
+
+    def onResponse(self, response):
+        """Fetch worker results, runs in the main thread."""
+        outcome = 'idle' if self.failure is None else 'error'
+        if response is not None and response[0]:  # Only changed messages are returned.
+            cache['sms.data'], fresh = response
+            cache['sms.data.gen'] += 1
+            msg = 'SMS data updated. New SMS received!' if fresh else 'SMS data updated.'
+            singletons.log(msg, 'Notice', msg)
+            events.publish(events.MESSAGES_CHANGED, fresh)
+            outcome = 'new'
+        self.schedule(outcome)
+
+    def schedule(self, outcome):
+        """Schedule the next poll."""
+        if self.stopped: return
+        delay = self.policy.next(outcome, conf['config.api.time.interval'], conf['config.api.time.min'], conf['config.api.time.max'])
+        if self.pushPending:  # Something was pushed during the last fetch.
+            self.pushPending = False
+            delay = 1
+        elif self.push.connected and outcome != 'error':  # Polling is only a safety net while push works.
+            delay = conf['config.api.time.max']
+        singletons.scheduler.cancel(self.job)
+        self.job = singletons.scheduler.once(delay, self.onUpdate)
+
+    def pushEvent(self, data):
+        """Push event from the remote API (runs in the push listener)."""
+        wx.CallAfter(self.onPush)
+
+    def onPush(self):
+        """New data announced by the remote API, fetch it right away."""
+        if self.stopped: return
+        if self.worker.busy.is_set():
+            self.pushPending = True
+            return
+        singletons.scheduler.cancel(self.job)
+        self.onUpdate()
+
+    def pushSettings(self):
+        """Push endpoint settings for the listener, None while push is disabled."""
+        url = conf['config.api.push.url'].strip()
+        if not url: return None
+        return url, self.headers(), aconf['api.push.timeout']
+
+    def log(self, *args):
+        """Log from the fetch worker, the actual logging happens in the main thread."""
+        wx.CallAfter(singletons.log, *args)
 
     def connectAPI(self):
-        """Connect to remote API."""
-        auth_header = 'Basic ' + base64.b64encode((conf['config.api.un'] + ':' + conf['config.api.ps']).encode()).decode()
-        request = urllib.request.Request(conf['config.api.url'], headers={'Authorization': auth_header})
+        """Connect to remote API (runs in the fetch worker).
+            Returns the messages and the ones never seen before (both newest first)
+            only when they changed, None otherwise.
+        """
+        self.pool.idle = conf['config.api.idle.timeout']
+        self.pool.closeIdle()
+        known, version = self.tail['messages'], self.tail['messages'].version
         try:
-            with urllib.request.urlopen(request) as response:
-                remoteStorage = response.read().decode('utf-8').splitlines()
-                singletons.log('Successfully connected to remote API.', 'Notice', 'Connected to remote API...')
-                result = [self._parseJSON(x) for x in remoteStorage]
-                result.reverse()
-                return [x for x in result if type(x) is dict]
+            messages = self.fetchTail()
+            if messages is None:  # The log was truncated or rotated.
+                self.log('Remote log was rewritten, fetching it whole.', 'Notice')
+                self.resetTail()
+                messages = self.fetchTail()
+            fetched = [x[1] for x in reversed(messages)]
+            self.archive(fetched)
+            fresh = self.seen.fresh(fetched)
+            self.tail['messages'].extend(messages)
+            self.recovered()
+            if self.tail['messages'] is known and known.version == version: return None  # Nothing new and nothing dropped.
+            published = self.tail['messages'].newest()
+            if self.tail['messages'] is not known and published == self.published: return None  # Refetched, but the same.
+            self.published = published
+            return published, fresh
         except urllib.error.HTTPError as e:  # HTTP errors
+            if e.code == 304:  # Not modified, nothing to parse.
+                self.log('Remote API data unchanged.', 'Notice', 'Connected to remote API...')
+                self.recovered()
+                return None
+            if e.code == 416 and self.tail['offset']:  # The log shrank below our offset.
+                self.log('Remote log was truncated, fetching it whole.', 'Notice')
+                self.resetTail()
+                return self.connectAPI()
             msg = 'Unable to connect to remote API, received HTTP%s!' % e.code
-            singletons.log('%s, "%s"' % (msg, e.reason), 'HTTP Error', msg)
+            self.failed(msg, '%s, "%s"' % (msg, e.reason), 'HTTP Error')
         except urllib.error.URLError as e:  # URL errors
             msg = 'Unable to connect to remote API (%s)!' % e.reason
-            singletons.log(msg, 'URL Error', msg)
+            self.failed(msg, msg, 'URL Error')
         except Exception as e:  # General errors
-            singletons.log('%s\n%s' % ('Unable to connect to remote API:\n', e), 'Error', 'Unable to connect to remote API, please check log!')
-        return []
+            self.failed('Unable to connect to remote API, please check log!', '%s\n%s' % ('Unable to connect to remote API:\n', e), 'Error')
+        return None
+
+    def archive(self, messages):
+        """Keep messages (newest first) in the local archive, new and evicted ones (runs in the fetch worker)."""
+        if singletons.archive is None or not messages: return
+        try: singletons.archive.ingest(messages)
+        except sqlite3.Error as e: wx.CallAfter(self.archiveFailed, e)  # Before the results reach the main thread.
+
+    def archiveFailed(self, error):
+        """The archive can not take new messages, browse the server's messages instead (main thread)."""
+        if singletons.archive is None: return
+        singletons.log('Unable to archive messages, the archive is no longer used:\n %s' % error, 'Error', 'Message archive disabled!')
+        singletons.archive.close()
+        singletons.archive = None
+
+    def failed(self, msg, detail, lvl):
+        """Fetch failure, the same failure repeating is only logged once."""
+        if msg != self.failure: self.log(detail, lvl, msg)
+        else: wx.CallAfter(singletons.statusbar.show, msg)
+        self.failure = msg
+
+    def recovered(self):
+        """Fetch success, note the end of any failure streak."""
+        if self.failure is not None:
+            self.log('Connection to remote API restored.', 'Notice')
+            self.failure = None
+
+    def fetchTail(self):
+        """Fetch the log (or its new tail) on a kept-alive connection.
+            Lines are parsed as they arrive, returns the new messages as (seq, message),
+            seq being None without a cursor API, or None if the log was rewritten.
+        """
+        headers = self.headers()
+        headers.update(self.conditionalHeaders())
+        headers.update(self.tailHeaders())
+        # Byte ranges must address the plain log, so tail requests are not compressed.
+        headers['Accept-Encoding'] = 'identity' if 'Range' in headers else 'gzip, deflate'
+        with self.pool.open(self.cursorURL(), headers, conf['config.api.timeout']) as response:
+            self.log('Successfully connected to remote API.', 'Notice', 'Connected to remote API...')
+            reader = LineReader(decodedChunks(response), aconf['api.max.response'], aconf['api.max.line'], aconf['api.tail.edge'])
+            seq = self.tailStart(response, reader)
+            if seq is False: return None
+            bulk = BulkDecoder(self.decodeCache, conf['config.api.key'], self._parseJSON, self.decodePool,
+                               aconf['api.bulk.threshold'], aconf['api.bulk.chunk'], aconf['sms.keep.extra'])
+            seqs = []
+            lines = reader
+            if reader.peek(len(ENVELOPE)) == ENVELOPE:  # The whole response is sealed at once.
+                try: lines = openEnvelope(reader.read(aconf['api.max.response']), conf['config.api.key'])
+                except ValueError as e:
+                    self.log('Unable to open the remote API response envelope:\n %s' % e, 'Warning')
+                    lines = []
+            for line in lines:
+                if line:
+                    bulk.add(line)
+                    seqs.append(seq)
+                if seq is not None: seq += 1
+            messages = [x for x in zip(seqs, bulk.finish(lambda msg: self.log(msg, 'Warning'))) if type(x[1]) is SMS]
+            if bulk.broken: self.closeDecodePool()
+            self.log(self.decodeCache.stats(), 'Notice')
+            if reader.skipped:
+                self.log('Skipped %s remote API line(s) longer than %s bytes.' % (reader.skipped, aconf['api.max.line']), 'Warning')
+            self.tailEnd(reader)
+            self.storeValidators(response.headers)
+            return messages
+
+    def headers(self):
+        """Common remote API request headers."""
+        return {'Authorization': self.authHeader(), 'User-Agent': '%s/%s' % (APPINFO['name'], APPINFO['ver'])}
+
+    def authHeader(self):
+        """Basic auth header, only rebuilt when the credentials change."""
+        creds = conf['config.api.un'], conf['config.api.ps']
+        if self.auth[0] != creds:
+            self.auth = (creds, 'Basic ' + base64.b64encode((creds[0] + ':' + creds[1]).encode()).decode())
+        return self.auth[1]
+
+    def validatorScope(self):
+        """Cache validators are only valid for the same log and key."""
+        return conf['config.api.url'], conf['config.api.key']
+
+    def conditionalHeaders(self):
+        """Conditional GET headers from the last successful response."""
+        headers = {}
+        if self.validators['scope'] != self.validatorScope(): return headers
+        if self.validators['etag'] is not None:
+            headers['If-None-Match'] = self.validators['etag']
+        if self.validators['modified'] is not None:
+            headers['If-Modified-Since'] = self.validators['modified']
+        return headers
+
+    def storeValidators(self, headers):
+        """Remember the ETag/Last-Modified validators of a response."""
+        self.validators['scope'] = self.validatorScope()
+        self.validators['etag'] = headers.get('ETag')
+        self.validators['modified'] = headers.get('Last-Modified')
+
+    def resetTail(self):
+        """Forget the tail position/cursor (and validators), the next fetch reads the whole log."""
+        messages = MessageStore(aconf['store.max.count'], aconf['store.max.age'], aconf['store.max.bytes'], self.archive)
+        self.tail = {'scope': None, 'offset': 0, 'start': 0, 'edge': b'', 'epoch': None, 'seq': None, 'messages': messages}
+        self.validators = {'scope': None, 'etag': None, 'modified': None}
+
+    def cursorURL(self):
+        """Log URL, asking only for the lines after our cursor if the API numbers them."""
+        url = conf['config.api.url']
+        if self.tail['seq'] is None or self.tail['scope'] != self.validatorScope(): return url
+        sep = '' if url.endswith(('?', '&')) else '&' if '?' in url else '?'
+        return '%s%ssince=%s' % (url, sep, self.tail['seq'])
+
+    def cursorStart(self, response, reader):
+        """Return the seq of the first line of a cursor API response, False if the numbering started over.
+            The response holds the lines after our cursor up to X-Seq-Last, messages
+            older than X-Seq-First are no longer kept by the server so we drop them too.
+        """
+        first, last = int(response.headers['X-Seq-First']), int(response.headers['X-Seq-Last'])
+        epoch = response.headers.get('X-Seq-Epoch')
+        since = self.tail['seq'] if self.tail['scope'] == self.validatorScope() else None
+        if since is None: self.resetTail()
+        elif epoch != self.tail['epoch'] or last < since: return False
+        self.tail['messages'].dropBefore(first)
+        self.tail.update({'scope': self.validatorScope(), 'epoch': epoch, 'seq': last})
+        reader.partial = True
+        return first if since is None else max(since + 1, first)
+
+    def tailHeaders(self):
+        """Range header asking only for the bytes appended since the last fetch.
+            The range starts a few bytes early, so the overlap can be compared
+            with the fingerprint of the previously read log edge.
+        """
+        if not conf['config.api.tail'] or self.tail['seq'] is not None: return {}
+        if self.tail['scope'] != self.validatorScope() or not self.tail['offset']: return {}
+        return {'Range': 'bytes=%s-' % (self.tail['offset'] - len(self.tail['edge']))}
+
+    def tailStart(self, response, reader):
+        """Check where a response continues the log.
+            Returns the seq of its first line (None without a cursor API), or
+            False if the log was rewritten and has to be fetched whole.
+        """
+        if response.headers.get('X-Seq-Last', '').isdigit() and response.headers.get('X-Seq-First', '').isdigit():
+            return self.cursorStart(response, reader)
+        if response.status == 206:
+            edge = self.tail['edge']
+            start = self.tail['offset'] - len(edge)
+            if self.rangeStart(response.headers.get('Content-Range')) != start: return False
+            if reader.read(len(edge)) != edge: return False
+            self.tail['start'] = start
+        else:  # Whole log
+            self.resetTail()
+        # In tail mode only complete lines are consumed, a partial last line is read again on the next fetch.
+        reader.partial = not conf['config.api.tail']
+        return None
+
+    def tailEnd(self, reader):
+        """Store the new tail position after a response was read."""
+        if self.tail['seq'] is not None: return
+        self.tail['scope'] = self.validatorScope()
+        self.tail['offset'] = self.tail['start'] + reader.consumed
+        self.tail['edge'] = reader.edge
+
+    def rangeStart(self, header):
+        """First byte position of a Content-Range header."""
+        try: return int(header.split()[1].split('-')[0])
+        except (AttributeError, IndexError, ValueError): return None
 
     def _parseJSON(self, line):
         """Parse JSON data."""
-        data = None
-        try:
-            data = json.loads(line)
-        except ValueError:
-            try:
-                rawline = self._decrypt(line)
-                if rawline:
-                    data = json.loads(rawline)
-            except ValueError as e:  # Garbage removal
-                singletons.log('JSON structure problem, unable to extract:\n %s' % e, 'Warning')
-            except Exception:  # General errors
-                err = traceback.format_exc(chain=False)
-                singletons.log('Unexpected error in line while trying to decrypt remote API response:\n %s' % err, 'Warning')
-        except Exception:  # General errors
-            err = traceback.format_exc(chain=False)
-            singletons.log('Unexpected error in line while parsing remote API response:\n %s' % err, 'Warning')
-        finally: return data
+        data, warning = decodeLine(line, self._decrypt, aconf['sms.keep.extra'])
+        if warning is not None: self.log(warning, 'Warning')
+        return data
 
     def _decrypt(self, encrypted_data):
         """Decrypt line.
             This is most probably a bad implementation, replicate/copy at your own peril!!!
         """
-        if not conf['config.api.key']: return ''
-        key = bytes(conf['config.api.key'], encoding='utf-8')
-        # Decode the base64-encoded string to obtain the IV and ciphertext
-        encrypted_data = base64.b64decode(encrypted_data)
-        iv = encrypted_data[:16]
-        ciphertext = encrypted_data[16:]
-        # Create a Cipher object using the same key, IV, and algorithm/mode of operation
-        backend = default_backend()
-        cipher = Cipher(algorithms.AES(key), modes.CBC(iv), backend=backend)
-        # Decrypt the ciphertext
-        decryptor = cipher.decryptor()
-        decrypted_data = decryptor.update(ciphertext) + decryptor.finalize()
-        # Remove any padding, we always expect a JSON structure
-        unpadder = padding.PKCS7(128).unpadder()
-        plaintext = unpadder.update(decrypted_data) + unpadder.finalize()
-        # Return the decrypted data
-        return plaintext.decode('utf-8')
+        return self.decrypter().decrypt(encrypted_data) if conf['config.api.key'] else ''
+
+    def decodePool(self):
+        """Worker pool for bulk decoding large logs, created on first use."""
+        workers = aconf['api.bulk.workers'] or os.cpu_count() or 1
+        if self.executor is None and workers > 1:  # A single worker would only add overhead.
+            try:
+                self.executor = concurrent.futures.ProcessPoolExecutor(workers, multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError, ValueError):  # No process support here, threads still help with decryption.
+                self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+        return self.executor
+
+    def closeDecodePool(self):
+        """Shut the bulk decoding pool down."""
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def cleanup(self):
+        """Release network and pool resources (runs in the fetch worker on exit)."""
+        self.pool.closeAll()
+        self.closeDecodePool()
+
+    def decrypter(self):
+        """Decryption engine for the current key, only rebuilt when the key changes."""
+        if self.engine is None or self.engine.key != conf['config.api.key']:
+            self.engine = Decrypter(conf['config.api.key'])
+        return self.engine
 
     def checkCreds(self):
         """Examine supplied API credentials if valid."""
@@ -270,6 +615,15 @@ class APIInterface:
             return True
         else: return False
 
+    def onExit(self):
+        """Stop polling and the fetch worker."""
+        self.stopped = True
+        events.unsubscribe(events.SETTINGS_CHANGED, self.push.wake)
+        events.unsubscribe(events.SETTINGS_CHANGED, self.onSettingsChanged)
+        self.push.stop()
+        singletons.scheduler.cancel(self.job)
+        self.worker.stop(self.cleanup)
+
 
 class MainFrame(MainGUI):
     """MainFrame GUI."""
@@ -279,7 +633,6 @@ class MainFrame(MainGUI):
         wx.Frame.__init__(self, parent, id=wx.ID_ANY, title=title, pos=pos, size=size, style=style)
         self.SetSizeHints(wx.Size(391, 252), DSIZE)
         setIcon(self)
-        self.mainTimer = wx.Timer()
         if pos == (-1, -1): self.Centre(wx.BOTH)
         singletons.systray = SysTray()
         singletons.statusbar = StatusBar(self)
@@ -292,40 +645,72 @@ class MainFrame(MainGUI):
         self.rightBtn.Bind(wx.EVT_BUTTON, self.rightBtnAct)
         self.aboutBtn.Bind(wx.EVT_BUTTON, self.aboutBtnAct)
         self.settingsBtn.Bind(wx.EVT_BUTTON, self.settingsBtnAct)
-        self.mainTimer.Bind(wx.EVT_TIMER, self.onUpdate)
+        self.searchInp.Bind(wx.EVT_SEARCH, self.searchAct)
+        self.searchInp.Bind(wx.EVT_SEARCH_CANCEL, self.searchCancelAct)
+        self.Bind(wx.EVT_SHOW, self.onShow)
+        events.subscribe(events.MESSAGES_CHANGED, self.chkDataStoreUpdate)
+        events.subscribe(events.ACTIVE_CHANGED, self.updateSMSGUI)
+        events.subscribe(events.ACTIVE_CHANGED, self.setChevron)
         # App flow
         self.initAppFlow()
 
     def initAppFlow(self):
         """Initial Application flow."""
+        self.total = singletons.archive.count() if singletons.archive is not None else 0
+        self.mark = singletons.archive.mark() if singletons.archive is not None else 0  # Newest archived row in view.
+        self.page = (None, [])  # (offset, messages) of the archive page in view.
+        self.results = None  # Search results being browsed.
+        self.shownGen = 0  # Generation of cache['sms.data'] on display.
+        self.shown = None  # The message on display.
         singletons.interfaceAPI = APIInterface()
-        self.mainTimer.Start(100)
-
-    def onUpdate(self, event):
-        """MainFrame timed events."""
-        self.chkDataStoreUpdate()
-        # Revert systray icon to default.
-        self.setDefSystryIco()
-        # Update chevrons.
-        self.setChevron()
-
-    def chkDataStoreUpdate(self):
-        """Check for updates in the data store."""
-        if cache['sms.data.store'] != cache['sms.data.raw']:
-            cache['sms.data.store'] = cache['sms.data.raw']
-            cache['sms.active'] = 0
-            self.updateSMSGUI()
-            self.notifyNewSMS()
-
-    def setDefSystryIco(self):
-        """Revert systray icon to default when app is open."""
-        if self.IsShown():
-            if not aconf['systray.def.ico']:
-                singletons.systray.changeICO()
+        if self.total: events.publish(events.ACTIVE_CHANGED)  # Archived history, until the server is reached.
+        else: self.setChevron()
+
+    def onShow(self, event):
+        """Window shown/hidden."""
+        events.publish(events.WINDOW_SHOWN, event.IsShown())
+        event.Skip()
+
+    def chkDataStoreUpdate(self, fresh=()):
+        """Check for updates in the data store.
+            The newest message is shown, unless an older one is being read (or searched),
+            which keeps its place. Only messages never seen before are notified.
+        """
+        if self.shownGen != cache['sms.data.gen']:
+            self.shownGen = cache['sms.data.gen']
+            mark = self.mark
+            if singletons.archive is not None:
+                self.total, self.mark = singletons.archive.count(), singletons.archive.mark()
+                self.page = (None, [])
+            if self.results is None:
+                cache['sms.active'] = self.position(self.shown, mark) if cache['sms.active'] else 0
+                events.publish(events.ACTIVE_CHANGED)
+            if fresh: self.notifyNewSMS(fresh)
+
+    def position(self, sms, mark):
+        """Current index of the active message, 0 (the newest) if it is gone."""
+        if sms is None: return 0
+        if singletons.archive is not None: return singletons.archive.position(sms, cache['sms.active'], mark) or 0
+        try: return cache['sms.data'].index(sms)
+        except ValueError: return 0
+
+    def messageCount(self):
+        """Number of browsable messages: search results, archived ones or else the server's."""
+        if self.results is not None: return len(self.results)
+        if singletons.archive is None: return len(cache['sms.data'])
+        return self.total
+
+    def message(self, index):
+        """Browsable message by index (newest first), archived messages are read a page at a time."""
+        if self.results is not None: return self.results[index]
+        if singletons.archive is None: return cache['sms.data'][index]
+        offset = index - index % aconf['archive.page']
+        if self.page[0] != offset: self.page = (offset, singletons.archive.page(offset, aconf['archive.page']))
+        return self.page[1][index - offset]
 
     def setChevron(self):
         """Chevron buttons state detection."""
-        if len(cache['sms.data.store']) <= 1:
+        if self.messageCount() <= 1:
             if self.leftBtn.IsEnabled():
                 self.leftBtn.Disable()
             if self.rightBtn.IsEnabled():
@@ -336,7 +721,7 @@ class MainFrame(MainGUI):
                     self.leftBtn.Disable()
                 if not self.rightBtn.IsEnabled():
                     self.rightBtn.Enable()
-            elif len(cache['sms.data.store']) - 1 == cache['sms.active']:
+            elif self.messageCount() - 1 == cache['sms.active']:
                 if self.rightBtn.IsEnabled():
                     self.rightBtn.Disable()
                 if not self.leftBtn.IsEnabled():
@@ -347,13 +732,14 @@ class MainFrame(MainGUI):
                 if not self.leftBtn.IsEnabled():
                     self.leftBtn.Enable()
 
-    def notifyNewSMS(self):
+    def notifyNewSMS(self, fresh):
         """Notification actions when receiving an SMS."""
         if not cache['sms.api.first.parse']:  # Do not notify on app boot if the Server already has messages.
             # When a new SMS arrives
-            singletons.systray.changeICO('appICOnotify')
+            if not self.IsShown(): singletons.systray.changeICO('appICOnotify')
             if conf['notif.system']:
-                Notification(self, 'New SMS received!', '', timeout=conf['notif.timeout.sec'])
+                title = 'New SMS received!' if len(fresh) == 1 else '%s new SMS received!' % len(fresh)
+                Notification(self, title, '', timeout=conf['notif.timeout.sec'])
             if conf['notif.open.app']:
                 if not self.IsShown(): self.Show()
             # Lessen the blocking effect of sounds
@@ -362,24 +748,57 @@ class MainFrame(MainGUI):
 
     def updateSMSGUI(self):
         """Update SMS data on the MainFrame GUI."""
-        cur = cache['sms.data.store'][cache['sms.active']]
-        self.fromTxt.SetLabel(cur['from'])
-        self.dateTxt.SetLabel('%s' % wx.DateTime.FromTimeT(round(cur['receivedStamp']/1000)))
-        self.smsTxt.SetValue(cur['text'])
+        cur = self.shown = self.message(cache['sms.active'])
+        self.fromTxt.SetLabel(cur.sender)
+        self.dateTxt.SetLabel('%s' % wx.DateTime.FromTimeT(round(cur.receivedStamp/1000)))
+        self.smsTxt.SetValue(cur.text)
 
     def leftBtnAct(self, event):
         """On button actions."""
         if cache['sms.active'] == 0:
             return
         cache['sms.active'] -= 1
-        self.updateSMSGUI()
+        events.publish(events.ACTIVE_CHANGED)
 
     def rightBtnAct(self, event):
         """On button actions."""
-        if len(cache['sms.data.store']) - 1 == cache['sms.active']:
+        if self.messageCount() - 1 == cache['sms.active']:
             return
         cache['sms.active'] += 1
-        self.updateSMSGUI()
+        events.publish(events.ACTIVE_CHANGED)
+
+    def searchAct(self, event):
+        """Browse the messages matching the search box."""
+        query = self.searchInp.GetValue().strip()
+        if not query: return self.searchCancelAct(None)
+        if singletons.archive is not None:
+            try: results = singletons.archive.search(query, aconf['archive.search.limit'])
+            except sqlite3.Error as e:
+                singletons.log('Unable to search the message archive:\n %s' % e, 'Error', 'Search failed!')
+                return
+        else:
+            words = query.lower().split()
+            results = [x for x in cache['sms.data'] if all(y in ('%s %s' % (x.sender, x.text)).lower() for y in words)]
+        if not results:
+            singletons.statusbar.show('No messages found.')
+            return
+        singletons.statusbar.show('%s message(s) found.' % len(results))
+        self.results = results
+        cache['sms.active'] = 0
+        events.publish(events.ACTIVE_CHANGED)
+
+    def searchCancelAct(self, event):
+        """Back to browsing all messages."""
+        searching = self.results is not None
+        self.clearSearch()
+        if not searching: return
+        cache['sms.active'] = 0
+        events.publish(events.ACTIVE_CHANGED)
+
+    def clearSearch(self):
+        """Forget the search results."""
+        self.results = None
+        self.searchInp.ChangeValue('')
 
     def aboutBtnAct(self, event):
         """On about actions."""
@@ -437,12 +856,18 @@ class MainFrame(MainGUI):
         singletons.statusbar.exit()
         if singletons.systray is not None:
             singletons.systray.onExit()
+        singletons.interfaceAPI.onExit()
+        if singletons.archive is not None: singletons.archive.close()
+        events.unsubscribe(events.MESSAGES_CHANGED, self.chkDataStoreUpdate)
+        events.unsubscribe(events.ACTIVE_CHANGED, self.updateSMSGUI)
+        events.unsubscribe(events.ACTIVE_CHANGED, self.setChevron)
         AppSettings().storeConf()
         self.Hide()
-        self.mainTimer.Destroy()
+        singletons.scheduler.stop()
         self.Destroy()
         singletons.app.ExitMainLoop()
         singletons.log('exit')
+        singletons.log.close()
 
 
 class MyApp(wx.App):
@@ -467,7 +892,7 @@ class Main:
         singletons.app = MyApp()
         aconf['platform'] = self.getOS()
         self.setAPPpaths()
-        singletons.log = Log
+        singletons.log = Log()
         singletons.confStore = AppSettings()
         self.initGUI()
 
@@ -475,6 +900,10 @@ class Main:
         """Init GUI."""
         singletons.log('init')
         singletons.confStore.parseConf()
+        singletons.scheduler = Scheduler()
+        try: singletons.archive = Archive(aconf['archive.db'])
+        except sqlite3.Error as e:
+            singletons.log('Unable to open the message archive %s, only the server\'s messages will be available:\n%s' % (aconf['archive.db'], e), 'Error')
         # Mainframe
         singletons.MainFrame = MainFrame(None, APPINFO['name'], conf['mainframe.pos'], conf['mainframe.size'])
         singletons.app.SetTopWindow(singletons.MainFrame)
@@ -532,9 +961,11 @@ class Main:
         aconf['profiles.dir'] = os.path.join(configDir, 'profiles')
         aconf['themes.dir'] = os.path.join(configDir, 'themes')
         aconf['app.conf'] = os.path.join(configDir, '%s.pkl' % APPINFO['name'])
+        aconf['archive.db'] = os.path.join(configDir, '%s.db' % APPINFO['name'])
         aconf['conf.dir'] = configDir
         if aconf['platform'] == 'linux': aconf['log.dir'] = configDir
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
     Main()